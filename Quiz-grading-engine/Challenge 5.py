@@ -3,10 +3,21 @@
 # UI claire, moderne (style carte centrale + bleu)
 # - QUESTIONS & logique identiques
 # - Sauvegarde dans /mnt/data/results.txt
+# - Banques de questions externes (JSON / NDJSON / CSV) via QUIZ_BANKS, indexées par id et rechargées à chaud
+# - Tirage stratifié par thème / difficulté (?quota=easy:3,medium:5&topic=...), rejouable depuis une graine
+# - Historique paginé, du plus récent au plus ancien, via un index d'offsets (results.txt.idx)
+# - Écriture des résultats groupée par un thread dédié (file bornée, verrou de fichier, vidage à l'arrêt)
 
 from flask import Flask, render_template_string, request, redirect, url_for, send_from_directory, flash, send_file
-from datetime import datetime
-import random, os, json
+from datetime import datetime, timedelta, timezone
+from itertools import accumulate
+from bisect import bisect_right
+from itsdangerous import URLSafeSerializer, BadSignature
+import random, os, json, csv, threading, time, zlib, struct, queue, atexit, signal, sys
+try:
+    import fcntl
+except ImportError:  # Windows: no advisory locks, single process only
+    fcntl = None
 
 app = Flask(__name__)
 app.secret_key = "replace-this-with-a-secure-random-key"
@@ -16,18 +27,188 @@ UPLOADED_HTML_PATH = '/mnt/data/PyChallenges.html'
 
 # ---------------- Questions ----------------
 QUESTIONS = [
-    {"id": 1, "text": "What is the output of 2 ** 3?", "answer": "8", "type": "text"},
-    {"id": 2, "text": "Which type is returned by input() ?", "answer": "string", "type": "text"},
-    {"id": 3, "text": "What keyword starts a loop in Python?", "choices": ["loop", "for", "repeat"], "answer": "for", "type": "mc"},
-    {"id": 4, "text": "What method converts text to lowercase?", "choices": ["lower()", "down()", "small()"], "answer": "lower()", "type": "mc"},
-    {"id": 5, "text": "Which structure uses key/value pairs?", "choices": ["list", "dict", "tuple"], "answer": "dict", "type": "mc"},
-    {"id": 6, "text": "What is the index of the first element in a list?", "answer": "0", "type": "text"},
-    {"id": 7, "text": "What keyword is used for conditions?", "choices": ["if", "cond", "check"], "answer": "if", "type": "mc"},
-    {"id": 8, "text": "len('Python') returns:", "answer": "6", "type": "text"},
-    {"id": 9, "text": "What operator tests equality?", "answer": "==", "type": "text"},
-    {"id": 10, "text": "What loop repeats while a condition is true?", "answer": "while", "type": "text"},
+    {"id": 1, "text": "What is the output of 2 ** 3?", "answer": "8", "type": "text", "topic": "operators", "difficulty": "easy"},
+    {"id": 2, "text": "Which type is returned by input() ?", "answer": "string", "type": "text", "topic": "types", "difficulty": "easy"},
+    {"id": 3, "text": "What keyword starts a loop in Python?", "choices": ["loop", "for", "repeat"], "answer": "for", "type": "mc", "topic": "loops", "difficulty": "easy"},
+    {"id": 4, "text": "What method converts text to lowercase?", "choices": ["lower()", "down()", "small()"], "answer": "lower()", "type": "mc", "topic": "strings", "difficulty": "medium"},
+    {"id": 5, "text": "Which structure uses key/value pairs?", "choices": ["list", "dict", "tuple"], "answer": "dict", "type": "mc", "topic": "data-structures", "difficulty": "medium"},
+    {"id": 6, "text": "What is the index of the first element in a list?", "answer": "0", "type": "text", "topic": "lists", "difficulty": "easy"},
+    {"id": 7, "text": "What keyword is used for conditions?", "choices": ["if", "cond", "check"], "answer": "if", "type": "mc", "topic": "conditions", "difficulty": "easy"},
+    {"id": 8, "text": "len('Python') returns:", "answer": "6", "type": "text", "topic": "strings", "difficulty": "medium"},
+    {"id": 9, "text": "What operator tests equality?", "answer": "==", "type": "text", "topic": "operators", "difficulty": "easy"},
+    {"id": 10, "text": "What loop repeats while a condition is true?", "answer": "while", "type": "text", "topic": "loops", "difficulty": "medium"},
 ]
 
+# ---------------- Question bank ----------------
+# QUIZ_BANKS: bank files separated by os.pathsep (.json list, .ndjson / .jsonl one question per line,
+# .csv with id,text,answer[,type,choices,topic,difficulty,...] where choices are separated by "|").
+# Built-in QUESTIONS come first; a later file overrides an earlier id.
+BANK_PATHS = [p.strip() for p in os.environ.get('QUIZ_BANKS', '').split(os.pathsep) if p.strip()]
+BANK_RELOAD_INTERVAL = float(os.environ.get('QUIZ_BANK_RELOAD', '1'))
+
+def normalize_answer(value):
+    return str(value).lower().strip()
+
+def prepare_question(raw):
+    q = dict(raw)
+    q['id'] = int(q['id'])
+    if not q.get('text') or q.get('answer') is None:
+        raise ValueError(f"question {q['id']}: text and answer are required")
+    choices = q.get('choices')
+    if isinstance(choices, str):
+        choices = [c.strip() for c in choices.split('|') if c.strip()]
+    if choices:
+        q['choices'] = choices
+    else:
+        q.pop('choices', None)
+    q['type'] = q.get('type') or ('mc' if choices else 'text')
+    q['topic'] = str(q.get('topic') or 'general').strip().lower()
+    q['difficulty'] = str(q.get('difficulty') or 'medium').strip().lower()
+    q['norm'] = normalize_answer(q['answer'])
+    return q
+
+def read_bank_file(path):
+    ext = os.path.splitext(path)[1].lower()
+    with open(path, 'r', encoding='utf-8-sig', newline='') as f:
+        if ext == '.csv':
+            rows = ({k: v for k, v in row.items() if k and v not in (None, '')} for row in csv.DictReader(f))
+        elif ext in ('.ndjson', '.jsonl'):
+            rows = (json.loads(line) for line in f if line.strip())
+        else:
+            data = json.load(f)
+            rows = data.get('questions', []) if isinstance(data, dict) else data
+        index = {}
+        for raw in rows:
+            q = prepare_question(raw)
+            index[q['id']] = q
+    return index
+
+class QuestionBank:
+    """Questions keyed by id, with answers normalized once at load time.
+
+    Files are re-read when their mtime or size changes; a file that fails to
+    parse keeps serving its previous contents.
+    """
+
+    def __init__(self, builtin, paths, interval=BANK_RELOAD_INTERVAL):
+        self.builtin = {q['id']: q for q in map(prepare_question, builtin)}
+        self.paths = list(paths)
+        self.interval = interval
+        self.lock = threading.Lock()
+        self.files = {}  # path -> (stamp, index)
+        self.by_id, self.ordered, self.buckets, self.fingerprint = {}, [], {}, 0
+        self.checked = 0.0
+        self.refresh(force=True)
+
+    def _stamp(self, path):
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        return (st.st_mtime_ns, st.st_size)
+
+    def refresh(self, force=False):
+        now = time.monotonic()
+        if not force and now - self.checked < self.interval:
+            return False
+        with self.lock:
+            self.checked = now
+            changed = False
+            for path in self.paths:
+                stamp = self._stamp(path)
+                old = self.files.get(path)
+                if old and old[0] == stamp:
+                    continue
+                if stamp is None:
+                    changed |= self.files.pop(path, None) is not None
+                    continue
+                try:
+                    self.files[path] = (stamp, read_bank_file(path))
+                except (OSError, ValueError, KeyError, TypeError) as e:
+                    app.logger.warning("question bank %s not reloaded: %s", path, e)
+                    self.files[path] = (stamp, old[1] if old else {})
+                    continue
+                changed = True
+            if changed or force:
+                by_id = dict(self.builtin)
+                for path in self.paths:
+                    if path in self.files:
+                        by_id.update(self.files[path][1])
+                self._rebuild(by_id)
+            return changed
+
+    def _rebuild(self, by_id):
+        # buckets: difficulty -> topic -> questions, in bank order so a seed
+        # always draws the same paper from the same bank (see fingerprint)
+        buckets, crc = {}, 0
+        for q in by_id.values():
+            buckets.setdefault(q['difficulty'], {}).setdefault(q['topic'], []).append(q)
+            crc = zlib.crc32(f"{q['id']}:{q['topic']}:{q['difficulty']};".encode('utf-8'), crc)
+        self.by_id, self.ordered, self.buckets, self.fingerprint = by_id, list(by_id.values()), buckets, crc
+
+    def get(self, qid):
+        return self.by_id.get(qid)
+
+    def questions(self):
+        return self.ordered
+
+    def __len__(self):
+        return len(self.by_id)
+
+BANK = QuestionBank(QUESTIONS, BANK_PATHS)
+
+# ---------------- Sampling ----------------
+MAX_PAPER_SIZE = 100
+DEFAULT_QUOTA = os.environ.get('QUIZ_QUOTA', '')
+PAPERS = URLSafeSerializer(app.secret_key, salt='quiz-paper')
+
+def parse_quota(text):
+    """'easy:3,medium:5,hard:2' -> [['easy', 3], ['medium', 5], ['hard', 2]]."""
+    quota = {}
+    for part in text.split(','):
+        if not part.strip():
+            continue
+        level, _, count = part.partition(':')
+        level = level.strip().lower()
+        if not level or not count.strip().isdigit():
+            raise ValueError(f"invalid quota entry: {part.strip()!r}")
+        quota[level] = quota.get(level, 0) + int(count)
+    if sum(quota.values()) > MAX_PAPER_SIZE:
+        raise ValueError(f"a paper holds at most {MAX_PAPER_SIZE} questions")
+    return [[level, count] for level, count in quota.items()]
+
+def draw(rng, groups, count):
+    """Pick `count` distinct questions from the concatenation of `groups` without copying them."""
+    ends = list(accumulate(len(g) for g in groups))
+    total = ends[-1] if ends else 0
+    picked = []
+    for i in rng.sample(range(total), min(count, total)):
+        j = bisect_right(ends, i)
+        picked.append(groups[j][i - (ends[j - 1] if j else 0)])
+    return picked
+
+def build_paper(spec, seed):
+    """Rebuild the same list of questions from (spec, seed) while the bank is unchanged."""
+    rng = random.Random(seed)
+    topics = spec.get('topics')
+    buckets = BANK.buckets
+
+    def groups(levels):
+        return [qs for level in levels for topic, qs in buckets.get(level, {}).items()
+                if not topics or topic in topics]
+
+    if spec.get('quota'):
+        paper = []
+        for level, count in spec['quota']:
+            paper += draw(rng, groups([level]), count)
+    elif spec.get('shuffle') or topics:
+        paper = draw(rng, groups(list(buckets)), spec['n'])
+    else:
+        return BANK.questions()[:spec['n']]
+    if spec.get('shuffle'):
+        rng.shuffle(paper)
+    return paper
+
 # ---------------- Templates ----------------
 # PAGE D’ACCUEIL – thème bleu
 
@@ -412,6 +593,7 @@ input[type="text"]{
           {% endfor %}
 
           <input type="hidden" name="ids" value="{{ ids }}">
+          <input type="hidden" name="paper" value="{{ paper }}">
           <div class="actions">
             <button type="button" id="prev" class="btn-ghost">← Previous</button>
             <div style="display:flex;gap:8px">
@@ -639,11 +821,20 @@ body{
   font-size:13px;
 }
 .actions{margin-top:14px;display:flex;gap:8px}
+.filters{display:flex;gap:10px;align-items:center;margin-bottom:14px}
+.filters input{border:1px solid #e5e7eb;border-radius:8px;padding:5px 8px;font:inherit}
+.pager{display:flex;justify-content:space-between;align-items:center;margin-top:14px}
 </style>
 </head>
 <body>
   <div class="container">
     <h1 style="color:#0f172a;margin-bottom:14px;">Attempts history</h1>
+    <form class="filters" method="get" action="{{ url_for('history') }}">
+      <label class="small">From <input type="date" name="from" value="{{ filters.get('from', '') }}"></label>
+      <label class="small">To <input type="date" name="to" value="{{ filters.get('to', '') }}"></label>
+      <input type="hidden" name="limit" value="{{ limit }}">
+      <button type="submit" class="btn-ghost">Filter</button>
+    </form>
     <div class="card">
       {% if attempts %}
         <table class="table">
@@ -660,6 +851,13 @@ body{
             {% endfor %}
           </tbody>
         </table>
+        <div class="pager small">
+          <span>Page {{ page }} of {{ pages }} · {{ matched }} attempts</span>
+          <span>
+            {% if page > 1 %}<a class="btn-ghost" href="{{ url_for('history', page=page-1, limit=limit, **filters) }}">← Newer</a>{% endif %}
+            {% if page < pages %}<a class="btn-ghost" href="{{ url_for('history', page=page+1, limit=limit, **filters) }}">Older →</a>{% endif %}
+          </span>
+        </div>
       {% else %}
         <p class="small">No attempts yet.</p>
       {% endif %}
@@ -673,10 +871,103 @@ body{
 </html>
 """
 
+# ---------------- Results writer ----------------
+RESULTS_QUEUE_MAX = int(os.environ.get('QUIZ_RESULTS_QUEUE', '10000'))
+RESULTS_BATCH_MAX = 512
+RESULTS_PUT_TIMEOUT = 2.0
+RESULTS_FSYNC = os.environ.get('QUIZ_RESULTS_FSYNC', '') == '1'
+
+def lock_file(f, exclusive=True):
+    """Advisory lock held until `f` is closed, so several workers can share results.txt."""
+    if fcntl:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+
+class ResultWriter:
+    """Group commit for results.txt: /submit only enqueues a line, and one thread
+    appends everything queued so far with a single locked write (and optional fsync).
+    """
+
+    def __init__(self, maxsize=RESULTS_QUEUE_MAX):
+        self.queue = queue.Queue(maxsize)
+        self.lock = threading.Lock()
+        self.closed = False
+        self.thread = threading.Thread(target=self._run, name='results-writer', daemon=True)
+        self.thread.start()
+
+    def submit(self, record):
+        line = json.dumps(record, ensure_ascii=False) + "\n"
+        if not self.closed:
+            try:
+                self.queue.put(line, timeout=RESULTS_PUT_TIMEOUT)
+                return
+            except queue.Full:
+                pass
+        # writer stopped or hopelessly behind: write it here rather than lose the attempt
+        self._write([line])
+
+    def flush(self, timeout=5.0):
+        """Wait until every record submitted before this call is on disk."""
+        if self.closed:
+            return True
+        done = threading.Event()
+        try:
+            self.queue.put(done, timeout=timeout)
+        except queue.Full:
+            return False
+        return done.wait(timeout)
+
+    def close(self, timeout=10.0):
+        if not self.closed:
+            self.closed = True
+            self.queue.put(None)
+            self.thread.join(timeout)
+
+    def _write(self, lines):
+        data = ''.join(lines).encode('utf-8')
+        with self.lock:
+            os.makedirs(os.path.dirname(RESULTS_PATH), exist_ok=True)
+            with open(RESULTS_PATH, 'a+b') as f:
+                lock_file(f)
+                if f.seek(0, os.SEEK_END):
+                    # files written by the first version end with a literal backslash-n
+                    f.seek(-1, os.SEEK_END)
+                    if f.read(1) != b'\n':
+                        data = b'\n' + data
+                f.write(data)
+                f.flush()
+                if RESULTS_FSYNC:
+                    os.fsync(f.fileno())
+
+    def _run(self):
+        closing = False
+        while not (closing and self.queue.empty()):
+            items = [] if closing else [self.queue.get()]
+            while len(items) < RESULTS_BATCH_MAX:
+                try:
+                    items.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            closing = closing or None in items
+            lines = [x for x in items if isinstance(x, str)]
+            while lines:
+                try:
+                    self._write(lines)
+                    break
+                except OSError as e:
+                    app.logger.error("could not write %d results: %s", len(lines), e)
+                    if closing:
+                        break
+                    time.sleep(1)
+            for x in items:
+                if isinstance(x, threading.Event):
+                    x.set()
+
+RESULTS_WRITER = ResultWriter()
+atexit.register(RESULTS_WRITER.close)
+
 # ---------------- Helpers ----------------
 def append_result_record(score, grade, correct, total, wrong_details, right_details):
     timestamp = datetime.utcnow().isoformat() + 'Z'
-    os.makedirs(os.path.dirname(RESULTS_PATH), exist_ok=True)
     record = {
         "timestamp": timestamp,
         "score": score,
@@ -686,32 +977,152 @@ def append_result_record(score, grade, correct, total, wrong_details, right_deta
         "wrong": wrong_details,
         "right": right_details
     }
-    with open(RESULTS_PATH, 'a', encoding='utf-8') as f:
-        f.write(json.dumps(record, ensure_ascii=False) + "\\n")
+    RESULTS_WRITER.submit(record)
     return timestamp
 
-def read_attempts():
-    if not os.path.exists(RESULTS_PATH):
-        return []
+# ---------------- History index ----------------
+# results.txt.idx holds one fixed-size entry per complete line of results.txt:
+# (byte offset, byte length, timestamp in ms). It is caught up lazily by scanning
+# only the bytes appended since the last indexed record, so a history page never
+# reads more of results.txt than the records it shows.
+HISTORY_INDEX_PATH = RESULTS_PATH + '.idx'
+INDEX_ENTRY = struct.Struct('<QQq')
+HISTORY_PAGE_SIZE = 20
+HISTORY_MAX_LIMIT = 200
+HISTORY_LOCK = threading.Lock()
+# the first version separated records with a literal backslash-n, all on one line
+LEGACY_SEPARATOR = b'\\n'
+
+def timestamp_ms(value):
+    try:
+        dt = datetime.fromisoformat(str(value).rstrip('Z'))
+    except ValueError:
+        return 0
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return int(dt.timestamp() * 1000)
+
+def parse_history_date(value, end=False):
+    """'2025-01-31' or a full ISO datetime -> ms; a bare date used as `to` covers the whole day."""
+    if not value:
+        return None
+    ms = timestamp_ms(value)
+    if not ms:
+        raise ValueError(f"invalid date: {value!r}")
+    if end and len(value.strip()) == 10:
+        ms += int(timedelta(days=1).total_seconds() * 1000)
+    return ms
+
+def split_legacy_line(line):
+    """(offset, length, record) for each record of a legacy line; stops at the first unparsable one."""
+    text = line.decode('utf-8', errors='replace')
+    decoder = json.JSONDecoder()
+    sep = LEGACY_SEPARATOR.decode()
+    out, i, byte_pos = [], 0, 0
+    while True:
+        j = i
+        while j < len(text) and text[j].isspace():
+            j += 1
+        if j == len(text):
+            return out
+        try:
+            rec, end = decoder.raw_decode(text, j)
+        except ValueError:
+            return out
+        if text.startswith(sep, end):
+            end += len(sep)
+        start_byte = byte_pos + len(text[i:j].encode('utf-8'))
+        byte_pos = start_byte + len(text[j:end].encode('utf-8'))
+        out.append((start_byte, byte_pos - start_byte, rec))
+        i = end
+
+def sync_history_index():
+    """Index the records appended since the last call; return the number of indexed records."""
+    with HISTORY_LOCK:
+        try:
+            size = os.path.getsize(RESULTS_PATH)
+        except OSError:
+            return 0
+        with open(HISTORY_INDEX_PATH, 'r+b' if os.path.exists(HISTORY_INDEX_PATH) else 'w+b') as idx, \
+             open(RESULTS_PATH, 'rb') as f:
+            lock_file(idx)
+            count = os.fstat(idx.fileno()).st_size // INDEX_ENTRY.size
+            start = last_ts = 0
+            if count:
+                idx.seek((count - 1) * INDEX_ENTRY.size)
+                offset, length, last_ts = INDEX_ENTRY.unpack(idx.read(INDEX_ENTRY.size))
+                start = offset + length
+                f.seek(max(0, start - len(LEGACY_SEPARATOR)))
+                tail = f.read(len(LEGACY_SEPARATOR))
+                if start > size or not (tail.endswith(b'\n') or tail == LEGACY_SEPARATOR):
+                    # results.txt was truncated or replaced: index it again
+                    count = start = last_ts = 0
+                    idx.truncate(0)
+            entries = []
+            f.seek(start)
+            pos = start
+            for line in f:
+                legacy = line.rstrip().endswith(LEGACY_SEPARATOR)
+                if not line.endswith(b'\n') and not legacy:
+                    break  # a record still being written
+                if legacy:
+                    records = split_legacy_line(line)
+                else:
+                    try:
+                        records = [(0, len(line), json.loads(line))]
+                    except ValueError:
+                        records = []
+                for offset, length, rec in records:
+                    try:
+                        ts = timestamp_ms(rec["timestamp"])
+                    except (KeyError, TypeError):
+                        continue
+                    # clamp so the index stays sorted by time for bisect
+                    last_ts = max(ts, last_ts)
+                    entries.append(INDEX_ENTRY.pack(pos + offset, length, last_ts))
+                pos += len(line)
+            idx.seek(count * INDEX_ENTRY.size)
+            idx.write(b''.join(entries))
+            return count + len(entries)
+
+def _first_at_or_after(idx, count, ms):
+    lo, hi = 0, count
+    while lo < hi:
+        mid = (lo + hi) // 2
+        idx.seek(mid * INDEX_ENTRY.size)
+        if INDEX_ENTRY.unpack(idx.read(INDEX_ENTRY.size))[2] < ms:
+            lo = mid + 1
+        else:
+            hi = mid
+    return lo
+
+def read_attempts(page=1, limit=HISTORY_PAGE_SIZE, since=None, until=None):
+    """Return (attempts, matched): one newest-first page of records with since <= timestamp < until."""
+    count = sync_history_index()
+    if not count:
+        return [], 0
     attempts = []
-    with open(RESULTS_PATH, 'r', encoding='utf-8') as f:
-        for line in f:
-            line=line.strip()
-            if not line:
-                continue
-            try:
-                rec = json.loads(line)
-                attempts.append({
-                    "timestamp": rec.get("timestamp",""),
-                    "score": rec.get("score",""),
-                    "grade": rec.get("grade",""),
-                    "correct": f'{rec.get("correct",0)}/{rec.get("total",0)}',
-                    "wrong_count": len(rec.get("wrong",[]))
-                })
-            except:
-                continue
-    attempts.reverse()
-    return attempts
+    decoder = json.JSONDecoder()
+    with open(HISTORY_INDEX_PATH, 'rb') as idx, open(RESULTS_PATH, 'rb') as f:
+        lo = _first_at_or_after(idx, count, since) if since is not None else 0
+        hi = _first_at_or_after(idx, count, until) if until is not None else count
+        end = hi - (page - 1) * limit
+        begin = max(lo, end - limit)
+        if end <= lo:
+            return [], max(0, hi - lo)
+        idx.seek(begin * INDEX_ENTRY.size)
+        for offset, length, _ in reversed(list(INDEX_ENTRY.iter_unpack(idx.read((end - begin) * INDEX_ENTRY.size)))):
+            f.seek(offset)
+            # raw_decode: a legacy record is followed by its literal separator
+            rec = decoder.raw_decode(f.read(length).decode('utf-8', errors='replace'))[0]
+            attempts.append({
+                "timestamp": rec.get("timestamp",""),
+                "score": rec.get("score",""),
+                "grade": rec.get("grade",""),
+                "correct": f'{rec.get("correct",0)}/{rec.get("total",0)}',
+                "wrong_count": len(rec.get("wrong",[]))
+            })
+    return attempts, hi - lo
 
 # ---------------- Routes ----------------
 @app.route('/')
@@ -724,30 +1135,49 @@ def quiz():
         n = int(request.args.get('n', 10))
     except:
         n = 10
+    n = max(1, min(n, MAX_PAPER_SIZE))
     shuffle = request.args.get('shuffle') is not None
-    pool = QUESTIONS.copy()
-    if shuffle:
-        random.shuffle(pool)
-    selected = pool[:min(n, len(pool))]
+    topics = sorted({t.strip().lower() for t in request.args.get('topic', '').split(',') if t.strip()})
+    try:
+        quota = parse_quota(request.args.get('quota', DEFAULT_QUOTA))
+        seed = int(request.args.get('seed') or random.getrandbits(64))
+    except ValueError as e:
+        flash(str(e))
+        return redirect(url_for('index'))
+    BANK.refresh()
+    spec = {"n": n, "shuffle": shuffle, "topics": topics, "quota": quota}
+    selected = build_paper(spec, seed)
     ids = ",".join(str(q['id']) for q in selected)
-    return render_template_string(QUIZ_HTML, questions=selected, total=len(selected), ids=ids)
+    paper = PAPERS.dumps({"seed": seed, "spec": spec, "bank": BANK.fingerprint})
+    return render_template_string(QUIZ_HTML, questions=selected, total=len(selected), ids=ids, paper=paper)
 
 @app.route('/submit', methods=['POST'])
 def submit():
-    ids = request.form.get('ids','')
-    ids_list = [int(x) for x in ids.split(',') if x.strip()]
+    try:
+        paper = PAPERS.loads(request.form.get('paper', ''))
+    except BadSignature:
+        flash('Invalid or missing quiz paper.')
+        return redirect(url_for('index'))
+    BANK.refresh()
+    by_id = BANK.by_id
+    if paper['bank'] == BANK.fingerprint:
+        ids_list = [q['id'] for q in build_paper(paper['spec'], paper['seed'])]
+    else:
+        # the bank was reloaded mid-quiz: the seed no longer maps to the same
+        # questions, so fall back to the posted ids, capped to the paper size
+        size = sum(c for _, c in paper['spec']['quota']) or paper['spec']['n']
+        ids = request.form.get('ids','')
+        ids_list = list(dict.fromkeys(int(x) for x in ids.split(',') if x.strip().isdigit()))[:size]
     correct = 0
     wrong = []
     right = []
     for qid in ids_list:
-        q = next((x for x in QUESTIONS if x['id'] == qid), None)
+        q = by_id.get(qid)
         if not q:
             continue
         key = f'q{qid}'
         given = (request.form.get(key) or '').strip()
-        given_norm = given.lower().strip()
-        correct_ans = str(q['answer']).lower().strip()
-        if given_norm == correct_ans:
+        if normalize_answer(given) == q['norm']:
             correct += 1
             right.append({"question": q['text'], "given": given or "(no answer)", "correct": q['answer']})
         else:
@@ -769,11 +1199,24 @@ def submit():
 
 @app.route('/history')
 def history():
-    attempts = read_attempts()
-    return render_template_string(HISTORY_HTML, attempts=attempts)
+    filters = {k: request.args[k] for k in ('from', 'to') if request.args.get(k)}
+    try:
+        page = max(1, int(request.args.get('page', 1)))
+        limit = max(1, min(int(request.args.get('limit', HISTORY_PAGE_SIZE)), HISTORY_MAX_LIMIT))
+        since = parse_history_date(filters.get('from'))
+        until = parse_history_date(filters.get('to'), end=True)
+    except ValueError:
+        flash('Invalid history filter.')
+        return redirect(url_for('history'))
+    RESULTS_WRITER.flush()
+    attempts, matched = read_attempts(page, limit, since, until)
+    pages = max(1, -(-matched // limit))
+    return render_template_string(HISTORY_HTML, attempts=attempts, matched=matched, page=page,
+                                  pages=pages, limit=limit, filters=filters)
 
 @app.route('/download-results-file')
 def download_results_file():
+    RESULTS_WRITER.flush()
     if os.path.exists(RESULTS_PATH):
         return send_file(RESULTS_PATH, as_attachment=True, download_name='results.txt')
     else:
@@ -792,4 +1235,6 @@ def uploaded_file():
 
 # ---------------- Run ----------------
 if __name__ == '__main__':
+  # turn SIGTERM into a normal exit so atexit flushes queued results
+  signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
   app.run(debug=True, port=9000, use_reloader=False)
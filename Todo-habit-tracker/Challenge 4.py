@@ -13,16 +13,47 @@ Improvements added:
 - Focus management for modal
 - Header centered & title visually emphasized; status column centered
 - Logo removed; title placed inside a framed badge that follows the logo structure
+- In-memory task store with a title hash index (tasks.json is read once at startup)
+- Append-only mutation journal (tasks.journal), compacted into tasks.json in the background
+- Deduplicated gzip backups with hourly/daily/weekly retention (/api/backups)
+- Pluggable storage: JSON files (default) or SQLite with TODO_BACKEND=sqlite (WAL, several workers)
+- Server-side filtering, sorting and cursor pagination on GET /api/tasks; the UI loads one page at a time
+- Conditional GET (ETag / Last-Modified -> 304) on tasks, categories and export
+- Delta sync (/api/tasks/changes?since=) so the UI patches its list instead of reloading it
+- Streaming export as JSON or NDJSON, optionally gzip-encoded and incremental (?since=)
+- Streaming import (JSON array or NDJSON) with title dedup, one category write, replace or merge mode
+- Category registry with live task/done counts (/api/categories?with_counts=1)
+- Atomic batch operations (/api/tasks/batch), used by Undo
+- Live updates over Server-Sent Events (/api/events): open tabs update in place
+- Prefix and typo-tolerant (trigram) title search index (/api/tasks/search) with suggestions
+- Recurring habits (daily / weekly days / every n days) with per-day bitsets and O(1) streak updates
+- Optional due dates with a sorted due index (/api/tasks/due) and a reminder scheduler (log / SSE / webhook)
+- Task priorities (1 = highest .. 5) and a "next up" queue (/api/tasks/next?k=) kept as a heap of open tasks
+- Multiple tags per task with a tag -> bitmap index for AND / NOT queries (/api/tasks/tagged, /api/tags)
+- Subtasks (parent title) with a materialized-path tree index and rolled-up progress (/api/projects)
+- Cold archive (opt-in): tasks done for more than TODO_ARCHIVE_DAYS move to append-only gzip segments (/api/archive)
+- Per-task versions with optimistic concurrency: If-Match (task or list ETag, 412) / "version" (409) on edit, mark and delete
+- Compact task records (__slots__, interned categories/tags) instead of one dict per task; --bench-memory N
 Run:
   python -m pip install flask
   python todo_web_app_pro.py
 Open http://127.0.0.1:5000
 """
 from __future__ import annotations
-from flask import Flask, jsonify, request, send_file, render_template_string
+from flask import Flask, jsonify, request, render_template_string, stream_with_context
+from flask.json.provider import DefaultJSONProvider
 from pathlib import Path
-from datetime import datetime
-import json, io
+from datetime import date, datetime, timedelta, timezone
+from functools import wraps
+from collections import OrderedDict, deque
+from collections.abc import Mapping, MutableMapping
+from array import array
+import json, os, threading, zlib, codecs, atexit, queue, bisect, hashlib, gzip, time, sqlite3, base64, heapq, uuid, logging, re, sys
+import urllib.request
+try:
+    import fcntl
+except ImportError:  # Windows: locks below are per process only
+    fcntl = None
 
 APP = Flask(__name__)
 APP.config["JSON_SORT_KEYS"] = False
@@ -30,30 +61,366 @@ APP.config["JSON_SORT_KEYS"] = False
 APP_DIR = Path(__file__).resolve().parent
 DATA_FILE = APP_DIR / "tasks.json"
 CATS_FILE = APP_DIR / "categories.json"
+HABITS_FILE = APP_DIR / "habits.json"
+DB_FILE = Path(os.environ.get("TODO_DB", APP_DIR / "tasks.db"))
+JOURNAL_FILE = APP_DIR / "tasks.journal"
+JOURNAL_OLD_FILE = APP_DIR / "tasks.journal.old"
 BACKUP_DIR = APP_DIR / "backups"
 BACKUP_DIR.mkdir(exist_ok=True)
+BACKUP_OBJECTS_DIR = BACKUP_DIR / "objects"
+BACKUP_INDEX_FILE = BACKUP_DIR / "index.json"
+ARCHIVE_DIR = APP_DIR / "archive"
+ARCHIVE_INDEX_FILE = ARCHIVE_DIR / "index.json"
 
 DEFAULT_CATEGORIES = ["study", "work", "personal", "general"]
+# "json" (tasks.json + journal, single process) or "sqlite" (tasks.db, several workers)
+STORAGE_BACKEND = os.environ.get("TODO_BACKEND", "json").lower()
+MAX_PAGE_SIZE = 500
+# task priority: 1 is the most urgent
+PRIORITY_MIN, PRIORITY_MAX, PRIORITY_DEFAULT = 1, 5, 3
+MAX_TAGS_PER_TASK = 20
+MAX_TASK_DEPTH = 16
+# changes remembered for /api/tasks/changes; older clients get a full reset
+CHANGE_LOG_MAX = 10000
+# commits kept in the SQLite change log other workers catch up from (older: full reload)
+SYNC_LOG_KEEP = 10000
+# minimum trigram similarity for fuzzy title matches
+SEARCH_MIN_SIMILARITY = 0.4
+# new category names are written at most this often (seconds)
+CATEGORY_FLUSH_DELAY = 2.0
+EXPORT_CHUNK_SIZE = 64 * 1024
+MAX_BATCH_OPS = 5000
+# Server-Sent Events: per-client queue bound, replay history, heartbeat (s)
+SSE_QUEUE_SIZE = 256
+SSE_HISTORY = 1024
+SSE_HEARTBEAT = 15
+SSE_RETRY_MS = 3000
+SSE_MAX_DELTA = 200   # larger changes are sent as 'reset'
+# where due-date reminders go: comma-separated log, sse, webhook
+REMINDER_SINKS = [s.strip() for s in os.environ.get("TODO_REMINDER_SINKS", "log,sse").split(",") if s.strip()]
+REMINDER_WEBHOOK_URL = os.environ.get("TODO_REMINDER_WEBHOOK", "")
+IMPORT_CHUNK_SIZE = 64 * 1024
+# journal is compacted into tasks.json once either limit is reached
+JOURNAL_MAX_OPS = 1000
+JOURNAL_MAX_BYTES = 4 * 1024 * 1024
+# backup every N mutations, or every BACKUP_INTERVAL seconds if anything changed
+BACKUP_EVERY_OPS = 200
+BACKUP_INTERVAL = 3600
+# tier -> (bucket seconds, number of buckets kept)
+BACKUP_RETENTION = {"recent": (60, 60), "hourly": (3600, 24), "daily": (86400, 14), "weekly": (7 * 86400, 8)}
+# tasks done for longer than this many days are moved to the archive (0 = never, manual only)
+ARCHIVE_AFTER_DAYS = int(os.environ.get("TODO_ARCHIVE_DAYS", "0"))
+ARCHIVE_SEGMENT_MAX_BYTES = 8 * 1024 * 1024
 
 def now_iso() -> str:
     return datetime.now().isoformat(timespec="seconds")
 
+# --- Task records ---
+TASK_FIELDS = ("title", "category", "done", "created", "version", "priority", "due", "tags", "parent", "completed")
+_TASK_FIELD_SET = frozenset(TASK_FIELDS)
+
+class Task(MutableMapping):
+    """
+    One task, stored in slots instead of a per-task dict (no hash table and no
+    repeated key strings per task). It behaves like the dict it replaces
+    (task["title"], .get, .update, dict(task)), so handlers and indexes are
+    unchanged; an unset slot is an absent key. Categories and tags are interned,
+    tags are kept as a tuple. Unknown keys go to a small `extra` dict.
+    """
+    __slots__ = TASK_FIELDS + ("extra",)
+
+    def __init__(self, fields=None) -> None:
+        self.extra = None
+        if fields:
+            self.update(fields)
+
+    def __getitem__(self, key: str):
+        try:
+            if key in _TASK_FIELD_SET:
+                return getattr(self, key)
+            return self.extra[key]
+        except (AttributeError, TypeError):
+            raise KeyError(key) from None
+
+    def get(self, key: str, default=None):
+        # hot path for the indexes: avoid the exception of a missing key
+        if key in _TASK_FIELD_SET:
+            return getattr(self, key, default)
+        return self.extra.get(key, default) if self.extra else default
+
+    def __setitem__(self, key: str, value) -> None:
+        if key == "category" and isinstance(value, str):
+            value = sys.intern(value)
+        elif key == "tags" and isinstance(value, (list, tuple)):
+            value = tuple(sys.intern(str(t)) for t in value)
+        if key in _TASK_FIELD_SET:
+            setattr(self, key, value)
+        else:
+            if self.extra is None:
+                self.extra = {}
+            self.extra[key] = value
+
+    def __delitem__(self, key: str) -> None:
+        try:
+            if key in _TASK_FIELD_SET:
+                delattr(self, key)
+            else:
+                del self.extra[key]
+        except (AttributeError, TypeError):
+            raise KeyError(key) from None
+
+    def __iter__(self):
+        for name in TASK_FIELDS:
+            if hasattr(self, name):
+                yield name
+        if self.extra:
+            yield from self.extra
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+    def __repr__(self) -> str:
+        return f"Task({self.to_dict()!r})"
+
+    def to_dict(self) -> dict:
+        return dict(self.items())
+
+def task_json(obj):
+    """json.dumps(default=...) hook for structures that contain Task records."""
+    if isinstance(obj, Task):
+        return obj.to_dict()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+class TaskJSONProvider(DefaultJSONProvider):
+    @staticmethod
+    def default(obj):
+        return obj.to_dict() if isinstance(obj, Task) else DefaultJSONProvider.default(obj)
+
+APP.json = TaskJSONProvider(APP)
+
 def load_tasks() -> list[dict]:
     if not DATA_FILE.exists():
         return []
     try:
-        return json.loads(DATA_FILE.read_text(encoding="utf-8"))
+        # records are built while parsing, so the per-task dicts never all exist at once
+        return json.loads(DATA_FILE.read_text(encoding="utf-8"), object_hook=Task)
     except Exception:
         return []
 
-def save_tasks(tasks: list[dict], make_backup: bool = True) -> None:
-    if make_backup and DATA_FILE.exists():
-        stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
-        try:
-            (BACKUP_DIR / f"tasks-{stamp}.json").write_text(DATA_FILE.read_text(encoding="utf-8"), encoding="utf-8")
-        except Exception:
-            pass
-    DATA_FILE.write_text(json.dumps(tasks, ensure_ascii=False, indent=2), encoding="utf-8")
+def save_tasks(tasks: list[dict]) -> None:
+    # write-then-rename so a crash mid-write never leaves a truncated snapshot
+    tmp = DATA_FILE.with_suffix(".json.tmp")
+    tmp.write_text(json.dumps(tasks, ensure_ascii=False, indent=2, default=task_json), encoding="utf-8")
+    os.replace(tmp, DATA_FILE)
+
+def read_journal(path: Path) -> list[dict]:
+    # a torn last line (crash mid-append) is skipped
+    if not path.exists():
+        return []
+    ops = []
+    with open(path, "rb") as f:
+        for line in f:
+            try:
+                op = json.loads(line)
+            except ValueError:
+                continue
+            if isinstance(op, dict) and "op" in op:
+                ops.append(op)
+    return ops
+
+class ProcessLock:
+    """
+    Reentrant lock shared by the threads of this process and, through an flock on
+    `path`, by every worker process using the same data directory.
+    """
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self._lock = threading.RLock()
+        self._depth = 0
+        self._fd: int | None = None
+
+    def __enter__(self) -> "ProcessLock":
+        self._lock.acquire()
+        if self._depth == 0 and fcntl is not None:
+            try:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+                fcntl.flock(self._fd, fcntl.LOCK_EX)
+            except BaseException:
+                if self._fd is not None:
+                    os.close(self._fd); self._fd = None
+                self._lock.release()
+                raise
+        self._depth += 1
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._depth -= 1
+        if self._depth == 0 and self._fd is not None:
+            os.close(self._fd)   # releases the flock
+            self._fd = None
+        self._lock.release()
+
+# --- Backups ---
+# Snapshots are stored once per distinct content as backups/objects/<sha256>.json.gz;
+# backups/index.json lists every backup point (id, timestamp, digest, task count).
+BACKUP_LOCK = ProcessLock(BACKUP_DIR / "index.lock")
+
+def _read_backup_index() -> list[dict]:
+    try:
+        entries = json.loads(BACKUP_INDEX_FILE.read_text(encoding="utf-8"))
+        return entries if isinstance(entries, list) else []
+    except Exception:
+        return []
+
+def _write_backup_index(entries: list[dict]) -> None:
+    tmp = BACKUP_INDEX_FILE.with_suffix(".json.tmp")
+    tmp.write_text(json.dumps(entries, ensure_ascii=False, indent=2), encoding="utf-8")
+    os.replace(tmp, BACKUP_INDEX_FILE)
+
+def create_backup(tasks: list[dict]) -> dict | None:
+    """Store a compressed snapshot unless it is identical to the latest backup. Returns the new entry."""
+    data = json.dumps(tasks, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    digest = hashlib.sha256(data).hexdigest()
+    with BACKUP_LOCK:
+        entries = _read_backup_index()
+        if entries and entries[-1]["digest"] == digest:
+            return None
+        obj = BACKUP_OBJECTS_DIR / f"{digest}.json.gz"
+        if not obj.exists():
+            BACKUP_OBJECTS_DIR.mkdir(parents=True, exist_ok=True)
+            tmp = obj.with_suffix(".tmp")
+            tmp.write_bytes(gzip.compress(data))
+            os.replace(tmp, obj)
+        now = datetime.now()
+        entry = {"id": f"{now.strftime('%Y%m%d-%H%M%S')}-{digest[:8]}", "created": now.isoformat(timespec="seconds"),
+                 "digest": digest, "count": len(tasks)}
+        entries.append(entry)
+        _write_backup_index(prune_backups(entries, now))
+        return entry
+
+def prune_backups(entries: list[dict], now: datetime) -> list[dict]:
+    """
+    Apply BACKUP_RETENTION: inside each tier's window only the newest backup of
+    every bucket (hour, day, week...) survives. The latest backup is always kept.
+    Objects no longer referenced by any entry are deleted.
+    """
+    keep, seen = [], set()
+    for i, e in enumerate(reversed(entries)):
+        ts = datetime.fromisoformat(e["created"]).timestamp()
+        age = now.timestamp() - ts
+        wanted = i == 0
+        for tier, (bucket, count) in BACKUP_RETENTION.items():
+            if age < bucket * count and (tier, int(ts // bucket)) not in seen:
+                seen.add((tier, int(ts // bucket))); wanted = True
+        if wanted:
+            keep.append(e)
+    keep.reverse()
+    live = {e["digest"] for e in keep}
+    for e in entries:
+        if e["digest"] not in live:
+            (BACKUP_OBJECTS_DIR / f"{e['digest']}.json.gz").unlink(missing_ok=True)
+    return keep
+
+def list_backups() -> list[dict]:
+    with BACKUP_LOCK:
+        return _read_backup_index()
+
+def load_backup(backup_id: str) -> list[dict] | None:
+    with BACKUP_LOCK:
+        entry = next((e for e in _read_backup_index() if e["id"] == backup_id), None)
+        if entry is None:
+            return None
+        return json.loads(gzip.decompress((BACKUP_OBJECTS_DIR / f"{entry['digest']}.json.gz").read_bytes()))
+
+# --- Archive ---
+# Archived tasks are appended as NDJSON to gzip segments (archive/segment-NNNNNN.ndjson.gz,
+# one gzip member per archiving run; a segment is closed once it passes
+# ARCHIVE_SEGMENT_MAX_BYTES). Every record gets a sequential archive id; archive/index.json
+# holds the next id, each segment's first id and count, and the ids restored since.
+ARCHIVE_LOCK = ProcessLock(ARCHIVE_DIR / "index.lock")
+
+def _read_archive_index() -> dict:
+    try:
+        index = json.loads(ARCHIVE_INDEX_FILE.read_text(encoding="utf-8"))
+        if isinstance(index, dict):
+            return index
+    except Exception:
+        pass
+    return {"next_id": 1, "segments": [], "restored": []}
+
+def _write_archive_index(index: dict) -> None:
+    tmp = ARCHIVE_INDEX_FILE.with_suffix(".json.tmp")
+    tmp.write_text(json.dumps(index, ensure_ascii=False), encoding="utf-8")
+    os.replace(tmp, ARCHIVE_INDEX_FILE)
+
+def archive_tasks(tasks: list[dict]) -> int:
+    """Append tasks to the current segment (fsynced before the index names them). Returns the first id."""
+    with ARCHIVE_LOCK:
+        ARCHIVE_DIR.mkdir(exist_ok=True)
+        index = _read_archive_index()
+        first = index["next_id"]
+        segments = index["segments"]
+        if not segments or (ARCHIVE_DIR / segments[-1]["name"]).stat().st_size >= ARCHIVE_SEGMENT_MAX_BYTES:
+            segments.append({"name": f"segment-{len(segments) + 1:06d}.ndjson.gz", "first_id": first, "count": 0})
+        seg = segments[-1]
+        archived = now_iso()
+        lines = "".join(json.dumps({"id": first + i, "archived": archived, "task": t}, ensure_ascii=False) + "\n"
+                        for i, t in enumerate(tasks))
+        with open(ARCHIVE_DIR / seg["name"], "ab") as f:
+            f.write(gzip.compress(lines.encode("utf-8")))
+            f.flush()
+            os.fsync(f.fileno())
+        seg["count"] += len(tasks)
+        index["next_id"] = first + len(tasks)
+        _write_archive_index(index)
+        return first
+
+def _segment_records(name: str):
+    # gzip.open reads concatenated members as one stream
+    with gzip.open(ARCHIVE_DIR / name, "rt", encoding="utf-8") as f:
+        for line in f:
+            yield json.loads(line)
+
+def list_archive(after: int = 0, limit: int = 50, q: str = "") -> tuple[list[dict], int | None]:
+    """
+    Archived (not restored) records with id > after, oldest first. Segments that
+    end before `after` are skipped using the index. Returns (records, next cursor).
+    """
+    q = q.strip().lower()
+    with ARCHIVE_LOCK:
+        index = _read_archive_index()
+        restored = set(index["restored"])
+        out = []
+        for seg in index["segments"]:
+            if seg["first_id"] + seg["count"] <= after + 1:
+                continue
+            for rec in _segment_records(seg["name"]):
+                if rec["id"] <= after or rec["id"] in restored:
+                    continue
+                if q and q not in str(rec["task"].get("title", "")).lower():
+                    continue
+                if len(out) == limit:
+                    return out, out[-1]["id"]
+                out.append(rec)
+        return out, None
+
+def read_archived(archive_id: int) -> dict | None:
+    with ARCHIVE_LOCK:
+        index = _read_archive_index()
+        if archive_id in index["restored"]:
+            return None
+        starts = [seg["first_id"] for seg in index["segments"]]
+        i = bisect.bisect_right(starts, archive_id) - 1
+        if i < 0 or archive_id >= starts[i] + index["segments"][i]["count"]:
+            return None
+        return next((r for r in _segment_records(index["segments"][i]["name"]) if r["id"] == archive_id), None)
+
+def mark_restored(archive_id: int) -> None:
+    with ARCHIVE_LOCK:
+        index = _read_archive_index()
+        index["restored"].append(archive_id)
+        _write_archive_index(index)
 
 def load_categories() -> list[str]:
     # Return categories from categories.json, or defaults if file missing/invalid
@@ -82,37 +449,2386 @@ def save_categories(cats: list[str]) -> None:
         pass
 
 def ensure_category_exists(cat: str) -> None:
-    cat = (cat or "").strip()
-    if not cat:
+    ensure_categories_exist([cat])
+
+def ensure_categories_exist(new_cats) -> None:
+    # the registry persists new names lazily, in one write per burst
+    with STORE.lock:
+        STORE.categories.register(new_cats)
+
+def norm_title(title: str) -> str:
+    # interned: the store's hash index and every secondary index share one key string per task
+    return sys.intern((title or "").strip().lower())
+
+def parse_due(value) -> str | None:
+    """
+    Normalize a due date/time to local 'YYYY-MM-DDTHH:MM:SS' (the format of
+    'created'), so due strings sort chronologically. A bare date means midnight;
+    an offset is converted to local time. Empty values clear the due date.
+    """
+    if value in (None, ""):
+        return None
+    try:
+        due = datetime.fromisoformat(str(value).strip().replace("Z", "+00:00"))
+    except ValueError:
+        raise ValueError("invalid due date") from None
+    if due.tzinfo is not None:
+        due = due.astimezone().replace(tzinfo=None)
+    return due.isoformat(timespec="seconds")
+
+# --- Storage backends ---
+class VersionConflict(Exception):
+    """A task changed since the version the caller (or this worker's copy) was based on."""
+    def __init__(self, title: str) -> None:
+        super().__init__(f"version conflict on {title!r}")
+        self.title = title
+
+# A backend makes the in-memory store durable: load() fills the store at startup,
+# write(op) persists one journal-style operation after it was applied in memory.
+class JsonBackend:
+    """
+    tasks.json snapshot + append-only tasks.journal (one JSON line per operation).
+    On startup the journal is replayed over the snapshot; once it grows past
+    JOURNAL_MAX_OPS / JOURNAL_MAX_BYTES a background thread folds it into a
+    fresh snapshot.
+    """
+    name = "json"
+
+    def __init__(self) -> None:
+        self.store: TaskStore | None = None
+        self._journal = None
+        self._journal_ops = 0
+        self._journal_bytes = 0
+        self._compacting = False
+
+    def load(self, store: TaskStore) -> None:
+        self.store = store
+        # versions are only meaningful within one process lifetime
+        store.epoch = uuid.uuid4().hex[:8]
+        store._reset(load_tasks())
+        replayed = 0
+        for path in (JOURNAL_OLD_FILE, JOURNAL_FILE):
+            for op in read_journal(path):
+                try:
+                    store._apply(op)
+                except (KeyError, TypeError, ValueError):
+                    continue
+                replayed += 1
+        if replayed or JOURNAL_OLD_FILE.exists() or JOURNAL_FILE.exists():
+            # fold whatever was replayed into the snapshot, start with an empty journal
+            if self._journal is not None:
+                self._journal.close(); self._journal = None
+            self._journal_ops = self._journal_bytes = 0
+            save_tasks(store.all())
+            JOURNAL_OLD_FILE.unlink(missing_ok=True)
+            JOURNAL_FILE.unlink(missing_ok=True)
+
+    def changed_externally(self) -> bool:
+        return False
+
+    def write(self, op: dict) -> int | None:
+        line = (json.dumps(op, ensure_ascii=False, default=task_json) + "\n").encode("utf-8")
+        if self._journal is None:
+            self._journal = open(JOURNAL_FILE, "ab")
+        self._journal.write(line)
+        self._journal.flush()
+        self._journal_ops += 1
+        self._journal_bytes += len(line)
+        if not self._compacting and (self._journal_ops >= JOURNAL_MAX_OPS or self._journal_bytes >= JOURNAL_MAX_BYTES):
+            self._compacting = True
+            threading.Thread(target=self.compact, name="tasks-compact", daemon=True).start()
+
+    def compact(self) -> None:
+        """
+        Write a fresh tasks.json snapshot and drop the journal. The live journal is
+        rotated to tasks.journal.old under the store lock, so writers keep appending
+        to a new file while the snapshot is serialized outside of it. If a previous
+        compaction failed, .old still holds operations no snapshot has: the journal
+        is appended to it rather than replacing it.
+        """
+        try:
+            with self.store.lock:
+                snapshot = [dict(t) for t in self.store.all()]
+                if self._journal is not None:
+                    self._journal.close(); self._journal = None
+                if JOURNAL_FILE.exists():
+                    if JOURNAL_OLD_FILE.exists():
+                        with open(JOURNAL_OLD_FILE, "ab") as old, open(JOURNAL_FILE, "rb") as cur:
+                            old.write(cur.read())
+                            old.flush()
+                            os.fsync(old.fileno())
+                        JOURNAL_FILE.unlink()
+                    else:
+                        os.replace(JOURNAL_FILE, JOURNAL_OLD_FILE)
+                self._journal_ops = self._journal_bytes = 0
+            save_tasks(snapshot)
+            JOURNAL_OLD_FILE.unlink(missing_ok=True)
+        except Exception:
+            APP.logger.exception("journal compaction failed; tasks.journal.old is kept for the next one")
+        finally:
+            self._compacting = False
+
+    def load_categories(self) -> list[str]:
+        return load_categories()
+
+    def save_categories(self, added, removed=()) -> None:
+        # one process owns the file, so a read-modify-write is safe
+        save_categories([c for c in load_categories() if c not in removed] + list(added))
+
+    def claim_reminder(self, key: str, due: str) -> bool:
+        return True   # one process owns the files
+
+class SqliteBackend:
+    """
+    SQLite database (WAL mode) shared by any number of worker processes.
+    Every task is one row keyed by its normalized title, with indexed category and
+    done columns; `data` holds the full task record. Single-task operations are
+    one-row UPDATE/DELETE statements, multi-task ones run in one transaction.
+    Every commit also logs the keys it touched in `changes` (by version); other
+    processes notice it through PRAGMA data_version and re-read only those rows.
+    `synced` is the version up to which this process has seen every commit.
+    """
+    name = "sqlite"
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS tasks (
+        key TEXT PRIMARY KEY,
+        pos INTEGER NOT NULL,
+        title TEXT NOT NULL,
+        category TEXT NOT NULL DEFAULT 'general',
+        done INTEGER NOT NULL DEFAULT 0,
+        data TEXT NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS idx_tasks_pos ON tasks(pos);
+    CREATE INDEX IF NOT EXISTS idx_tasks_category ON tasks(category);
+    CREATE INDEX IF NOT EXISTS idx_tasks_done ON tasks(done);
+    CREATE TABLE IF NOT EXISTS categories (name TEXT PRIMARY KEY, pos INTEGER NOT NULL);
+    CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+    CREATE TABLE IF NOT EXISTS changes (version INTEGER NOT NULL, key TEXT NOT NULL, old TEXT);
+    CREATE INDEX IF NOT EXISTS idx_changes_version ON changes(version);
+    CREATE TABLE IF NOT EXISTS reminders (key TEXT NOT NULL, due TEXT NOT NULL, PRIMARY KEY (key, due));
+    """
+
+    def __init__(self, path: Path) -> None:
+        self.store: TaskStore | None = None
+        self.db = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.executescript(self.SCHEMA)
+        # the data-set version is shared by all workers, so ETags agree between them
+        self.db.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('epoch', ?)", (uuid.uuid4().hex[:8],))
+        self.db.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('version', '0')")
+        # versions up to log_floor are not in the change log (pruned, or older than it)
+        self.db.execute("INSERT OR IGNORE INTO meta (key, value) SELECT 'log_floor', value FROM meta WHERE key='version'")
+        # bumped by every save_categories(), so load_categories() only re-reads after one
+        self.db.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('categories', '0')")
+        self._categories: tuple[str, list[str]] = ("", [])
+        self.synced = 0
+        self.epoch = self.db.execute("SELECT value FROM meta WHERE key='epoch'").fetchone()[0]
+        # an existing tasks.json is imported exactly once, by the first worker that
+        # opens an empty database; later empty loads (after a clear) must not redo it
+        claimed = self.db.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('json_migrated', '1')").rowcount == 1
+        self._migrate = (claimed and DATA_FILE.exists()
+                         and self.db.execute("SELECT 1 FROM tasks LIMIT 1").fetchone() is None)
+        if not self.db.execute("SELECT 1 FROM categories LIMIT 1").fetchone():
+            self.save_categories(load_categories())
+        self._data_version = self._current_data_version()
+
+    def _current_data_version(self) -> int:
+        return self.db.execute("PRAGMA data_version").fetchone()[0]
+
+    def _version(self) -> int:
+        return int(self.db.execute("SELECT value FROM meta WHERE key='version'").fetchone()[0])
+
+    def load(self, store: TaskStore) -> None:
+        self.store = store
+        store.epoch, store.version = self.epoch, self._version()
+        self.synced = store.version
+        if self._migrate:
+            # first start on an existing JSON data set: migrate it
+            self._migrate = False
+            store._reset(load_tasks())
+            self.write({"op": "import", "tasks": store.all()})
+            return
+        # rows are turned into records one at a time, straight from the cursor
+        store._reset(Task(json.loads(r[0])) for r in self.db.execute("SELECT data FROM tasks ORDER BY pos"))
+
+    def changed_externally(self) -> bool:
+        version = self._current_data_version()
+        if version == self._data_version:
+            return False
+        self._data_version = version
+        return True
+
+    def changes_after(self) -> tuple[int, list, dict] | None:
+        """
+        Commits since `synced`: (current version, [(key, previous key of a rename)]
+        in commit order, {key: current row data or None}). None when the log does
+        not cover them (pruned, or a whole-table import/clear): reload instead.
+        """
+        cur = self.db.cursor()
+        cur.execute("BEGIN")   # one read snapshot for the log and the rows
+        try:
+            current = self._version()
+            floor = int(cur.execute("SELECT value FROM meta WHERE key='log_floor'").fetchone()[0])
+            if not floor <= self.synced <= current:
+                return None
+            log = cur.execute("SELECT key, old FROM changes WHERE version > ? ORDER BY version, rowid",
+                              (self.synced,)).fetchall()
+            if any(key == "" for key, _ in log):
+                return None
+            keys = list({k for pair in log for k in pair if k})
+            rows = {}
+            for i in range(0, len(keys), 500):
+                chunk = keys[i:i + 500]
+                rows.update(cur.execute(f"SELECT key, data FROM tasks WHERE key IN ({','.join('?' * len(chunk))})", chunk))
+        finally:
+            cur.execute("COMMIT")
+        self.synced = current
+        return current, log, rows
+
+    @classmethod
+    def _logged_keys(cls, op: dict) -> list[tuple[str, str | None]] | None:
+        """(key, previous key of a rename) for every row an operation touches; None for whole-table ops."""
+        kind = op["op"]
+        if kind == "add":
+            return [(norm_title(op["task"].get("title", "")), None)]
+        if kind == "edit":
+            old, new = norm_title(op["title"]), norm_title(op["changes"].get("title") or op["title"])
+            return [(new, old if old != new else None)]
+        if kind == "mark":
+            return [(norm_title(t), None) for t in op["titles"]]
+        if kind == "delete":
+            return [(norm_title(op["title"]), None)]
+        if kind == "merge":
+            return [(norm_title(t.get("title", "")), None) for t in op["tasks"]]
+        if kind == "batch":
+            keys = []
+            for sub in op["ops"]:
+                sub_keys = cls._logged_keys(sub)
+                if sub_keys is None:
+                    return None
+                keys += sub_keys
+            return keys
+        return None
+
+    @staticmethod
+    def _row(task: dict) -> tuple:
+        return (task.get("title", ""), task.get("category") or "general", int(bool(task.get("done"))),
+                json.dumps(task, ensure_ascii=False, default=task_json), norm_title(task.get("title", "")))
+
+    def write(self, op: dict) -> int:
+        kind, cur = op["op"], self.db.cursor()
+        cur.execute("BEGIN IMMEDIATE")
+        try:
+            # compare-and-swap: every touched row must still be at the version our
+            # in-memory copy had (another worker may have written since our last sync)
+            for key, version in (op.get("expect") or {}).items():
+                row = cur.execute("SELECT json_extract(data, '$.version') FROM tasks WHERE key=?", (key,)).fetchone()
+                if (None if row is None else row[0] or 1) != version:
+                    raise VersionConflict(key)
+            if kind == "add":
+                cur.execute("INSERT OR REPLACE INTO tasks (title, category, done, data, key, pos) "
+                            "VALUES (?, ?, ?, ?, ?, (SELECT COALESCE(MAX(pos), 0) + 1 FROM tasks))", self._row(op["task"]))
+            elif kind == "edit":
+                task = self.store.get(op["changes"].get("title") or op["title"])
+                cur.execute("UPDATE tasks SET title=?, category=?, done=?, data=?, key=? WHERE key=?",
+                            self._row(task) + (norm_title(op["title"]),))
+            elif kind == "mark":
+                tasks = [self.store.get(t) for t in op["titles"]]
+                cur.executemany("UPDATE tasks SET title=?, category=?, done=?, data=? WHERE key=?",
+                                [self._row(t) for t in tasks if t is not None])
+            elif kind == "delete":
+                cur.execute("DELETE FROM tasks WHERE key=?", (norm_title(op["title"]),))
+            elif kind == "merge":
+                base = cur.execute("SELECT COALESCE(MAX(pos), 0) + 1 FROM tasks").fetchone()[0]
+                cur.executemany("INSERT INTO tasks (title, category, done, data, key, pos) VALUES (?, ?, ?, ?, ?, ?) "
+                                "ON CONFLICT(key) DO UPDATE SET title=excluded.title, category=excluded.category, "
+                                "done=excluded.done, data=excluded.data",
+                                [self._row(self.store.get(t["title"])) + (base + i,) for i, t in enumerate(op["tasks"])])
+            elif kind == "batch":
+                # replay deletes and renames in order, then write the final state of every touched row
+                touched = {}
+                for sub in op["ops"]:
+                    if sub["op"] == "edit":
+                        old, new = norm_title(sub["title"]), norm_title(sub["changes"].get("title") or sub["title"])
+                        if old != new:
+                            cur.execute("UPDATE tasks SET key=? WHERE key=?", (new, old))
+                        touched.update(dict.fromkeys((old, new)))
+                    elif sub["op"] == "delete":
+                        cur.execute("DELETE FROM tasks WHERE key=?", (norm_title(sub["title"]),))
+                        touched[norm_title(sub["title"])] = None
+                    elif sub["op"] == "add":
+                        touched[norm_title(sub["task"].get("title", ""))] = None
+                    elif sub["op"] == "mark":
+                        touched.update(dict.fromkeys(norm_title(t) for t in sub["titles"]))
+                base = cur.execute("SELECT COALESCE(MAX(pos), 0) + 1 FROM tasks").fetchone()[0]
+                for i, key in enumerate(touched):
+                    task = self.store.get(key)
+                    if task is None:
+                        cur.execute("DELETE FROM tasks WHERE key=?", (key,))
+                    else:
+                        cur.execute("INSERT INTO tasks (title, category, done, data, key, pos) VALUES (?, ?, ?, ?, ?, ?) "
+                                    "ON CONFLICT(key) DO UPDATE SET title=excluded.title, category=excluded.category, "
+                                    "done=excluded.done, data=excluded.data", self._row(task) + (base + i,))
+            elif kind in ("import", "clear"):
+                cur.execute("DELETE FROM tasks")
+                cur.executemany("INSERT OR REPLACE INTO tasks (title, category, done, data, key, pos) VALUES (?, ?, ?, ?, ?, ?)",
+                                [self._row(t) + (i,) for i, t in enumerate(self.store.all())])
+            cur.execute("UPDATE meta SET value = CAST(value AS INTEGER) + 1 WHERE key='version'")
+            version = int(cur.execute("SELECT value FROM meta WHERE key='version'").fetchone()[0])
+            keys = self._logged_keys(op)
+            cur.executemany("INSERT INTO changes (version, key, old) VALUES (?, ?, ?)",
+                            [(version, k, o) for k, o in keys] if keys is not None else [(version, "", None)])
+            if version % 100 == 0 and version > SYNC_LOG_KEEP:
+                cur.execute("DELETE FROM changes WHERE version <= ?", (version - SYNC_LOG_KEEP,))
+                cur.execute("UPDATE meta SET value = ? WHERE key='log_floor'", (str(version - SYNC_LOG_KEEP),))
+            cur.execute("COMMIT")
+        except BaseException:
+            cur.execute("ROLLBACK")
+            raise
+        if version == self.synced + 1:
+            # nobody else committed since our last sync: our own commit must not
+            # look like another worker's (otherwise the next sync picks up the gap)
+            self.synced = version
+            self._data_version = self._current_data_version()
+        return version
+
+    def load_categories(self) -> list[str]:
+        version = self.db.execute("SELECT value FROM meta WHERE key='categories'").fetchone()[0]
+        if version != self._categories[0]:
+            rows = self.db.execute("SELECT name FROM categories ORDER BY pos").fetchall()
+            self._categories = (version, [r[0] for r in rows])
+        return self._categories[1].copy() or DEFAULT_CATEGORIES.copy()
+
+    def save_categories(self, added, removed=()) -> None:
+        """
+        Apply one worker's changes to the shared list: new names are appended
+        unless another worker already has them, removed names are deleted, and
+        the categories version is bumped, all in one transaction. Names nobody
+        touched are left alone, so concurrent workers never drop each other's.
+        """
+        added = list(dict.fromkeys(str(c).strip() for c in added if c and str(c).strip()))
+        cur = self.db.cursor()
+        cur.execute("BEGIN IMMEDIATE")
+        try:
+            cur.executemany("INSERT OR IGNORE INTO categories (name, pos) "
+                            "SELECT ?, COALESCE(MAX(pos), -1) + 1 FROM categories", [(c,) for c in added])
+            cur.executemany("DELETE FROM categories WHERE name = ?", [(c,) for c in removed])
+            cur.execute("UPDATE meta SET value = CAST(value AS INTEGER) + 1 WHERE key='categories'")
+            cur.execute("COMMIT")
+        except BaseException:
+            cur.execute("ROLLBACK")
+            raise
+
+    def claim_reminder(self, key: str, due: str) -> bool:
+        """
+        Compare-and-swap on the (task, due date) row: only the first worker to
+        insert it fires the reminder. Rows of due dates over a day old are dropped.
+        """
+        claimed = self.db.execute("INSERT OR IGNORE INTO reminders (key, due) VALUES (?, ?)", (key, due)).rowcount == 1
+        if claimed:
+            cutoff = (datetime.now() - timedelta(days=1)).isoformat(timespec="seconds")
+            self.db.execute("DELETE FROM reminders WHERE due < ?", (cutoff,))
+        return claimed
+
+def make_backend():
+    if STORAGE_BACKEND == "sqlite":
+        return SqliteBackend(DB_FILE)
+    return JsonBackend()
+
+# --- Category registry ---
+class CategoryRegistry:
+    """
+    Known categories in display order with live per-category task and done counts.
+    It is one of the store's indexes: add()/remove() are called for every task that
+    enters or leaves the store (an edit is a remove followed by an add), so counts
+    never need a rescan. New names are persisted lazily: writes are coalesced and
+    happen at most once per CATEGORY_FLUSH_DELAY seconds, and only the names added
+    since the last flush are handed to the backend.
+    """
+    def __init__(self, backend, lock) -> None:
+        self.backend = backend
+        self.lock = lock
+        self.names: list[str] = []
+        self.counts: dict[str, int] = {}
+        self.done: dict[str, int] = {}
+        self.total = 0
+        self.done_total = 0
+        self._added: list[str] = []    # registered here, not yet persisted
+        self._timer: threading.Timer | None = None
+        self.revision = 0   # bumped whenever a name is added
+
+    def load(self) -> None:
+        self.names = list(dict.fromkeys(self.backend.load_categories()))
+        self.clear()
+
+    def clear(self) -> None:
+        self.counts = dict.fromkeys(self.names, 0)
+        self.done = dict.fromkeys(self.names, 0)
+        self.total = self.done_total = 0
+
+    def register(self, names) -> None:
+        for name in names:
+            name = (name or "").strip()
+            if name and name not in self.counts:
+                self.names.append(name)
+                self.counts[name] = self.done[name] = 0
+                self._added.append(name)
+                self.revision += 1
+        if self._added and self._timer is None:
+            self._timer = threading.Timer(CATEGORY_FLUSH_DELAY, self.flush)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def merge(self, names) -> None:
+        """Adopt names another worker registered (already persisted by it)."""
+        for name in names:
+            if name and name not in self.counts:
+                self.names.append(name)
+                self.counts[name] = self.done[name] = 0
+                self.revision += 1
+
+    def flush(self) -> None:
+        with self.lock:
+            self._timer = None
+            if self._added:
+                added, self._added = self._added, []
+                self.backend.save_categories(added)
+
+    def add(self, tid: int, task: dict) -> None:
+        cat = (task.get("category") or "general").strip()
+        self.register([cat])
+        done = int(bool(task.get("done")))
+        self.counts[cat] += 1; self.done[cat] += done
+        self.total += 1; self.done_total += done
+
+    def remove(self, tid: int, task: dict) -> None:
+        cat = (task.get("category") or "general").strip()
+        done = int(bool(task.get("done")))
+        if cat in self.counts:
+            self.counts[cat] -= 1; self.done[cat] -= done
+        self.total -= 1; self.done_total -= done
+
+    def listing(self, with_counts: bool = False) -> list:
+        if not with_counts:
+            return list(self.names)
+        return [{"name": n, "count": self.counts[n], "done": self.done[n]} for n in self.names]
+
+# --- Title search index ---
+def trigrams(text: str) -> set[str]:
+    # each word is padded on its own, so word starts/ends weigh in wherever they are
+    grams = set()
+    for word in text.split():
+        padded = f"  {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+class TitleSearchIndex:
+    """
+    Store index over normalized titles.
+    Prefix search: a sorted list of (token, id) where the tokens are the whole
+    title and each of its words, searched with bisect.
+    Fuzzy search: trigram -> ids inverted index; candidates are ranked by the
+    share of the query's trigrams found in the title (shorter titles first on
+    ties), which tolerates typos and word order. Each posting list is a sorted
+    array of ids (8 bytes per entry instead of a set slot): ids only grow, so
+    adding is mostly an append and removing is a bisection.
+    """
+    def __init__(self) -> None:
+        self._sorted: list[tuple[str, int]] = []
+        self._grams: dict[str, array] = {}
+        self._size = array("H")     # id -> number of trigrams of its title
+
+    @staticmethod
+    def _tokens(key: str) -> set[str]:
+        # words are interned: a common word is one string, not one per title
+        return {key, *map(sys.intern, key.split())}
+
+    def clear(self) -> None:
+        self._sorted.clear(); self._grams.clear(); self._size = array("H")
+
+    def _add_grams(self, tid: int, key: str) -> None:
+        grams = trigrams(key)
+        for g in grams:
+            ids = self._grams.get(g)
+            if ids is None:
+                self._grams[g] = array("q", (tid,))
+            elif ids[-1] < tid:
+                ids.append(tid)
+            else:
+                ids.insert(bisect.bisect_left(ids, tid), tid)
+        if tid >= len(self._size):
+            self._size.extend(array("H", bytes(2 * (tid + 1 - len(self._size) + len(self._size) // 2))))
+        self._size[tid] = min(len(grams), 0xFFFF)
+
+    def rebuild(self, items) -> None:
+        """Bulk load: collect every token first and sort once (insort per token is O(n²))."""
+        self.clear()
+        for tid, task in items:
+            key = norm_title(task.get("title", ""))
+            self._sorted.extend((token, tid) for token in self._tokens(key))
+            self._add_grams(tid, key)
+        self._sorted.sort()
+
+    def add(self, tid: int, task: dict) -> None:
+        key = norm_title(task.get("title", ""))
+        for token in self._tokens(key):
+            bisect.insort(self._sorted, (token, tid))
+        self._add_grams(tid, key)
+
+    def remove(self, tid: int, task: dict) -> None:
+        key = norm_title(task.get("title", ""))
+        for token in self._tokens(key):
+            i = bisect.bisect_left(self._sorted, (token, tid))
+            if i < len(self._sorted) and self._sorted[i] == (token, tid):
+                del self._sorted[i]
+        for g in trigrams(key):
+            ids = self._grams.get(g)
+            if ids is not None:
+                i = bisect.bisect_left(ids, tid)
+                if i < len(ids) and ids[i] == tid:
+                    del ids[i]
+                if not ids:
+                    del self._grams[g]
+
+    def containing(self, text: str) -> list[int] | None:
+        """
+        Ids whose title may contain `text` (a superset; callers check the title).
+        Each word of `text` lies inside one word of such a title, so every run of
+        three letters in it is one of the title's trigrams: intersect those
+        posting lists. None when `text` has no such run.
+        """
+        grams = {w[i:i + 3] for w in text.split() for i in range(len(w) - 2)}
+        if not grams:
+            return None
+        lists = sorted((self._grams.get(g, ()) for g in grams), key=len)
+        found = set(lists[0])
+        for ids in lists[1:]:
+            found.intersection_update(ids)
+        return list(found)
+
+    def prefix(self, prefix: str, limit: int) -> list[int]:
+        found: dict[int, None] = {}
+        i = bisect.bisect_left(self._sorted, (prefix, -1))
+        while i < len(self._sorted) and len(found) < limit:
+            token, tid = self._sorted[i]
+            if not token.startswith(prefix):
+                break
+            found[tid] = None
+            i += 1
+        return list(found)
+
+    def fuzzy(self, query: str, limit: int, min_score: float = SEARCH_MIN_SIMILARITY) -> list[tuple[int, float]]:
+        grams = trigrams(query)
+        shared: dict[int, int] = {}
+        for g in grams:
+            for tid in self._grams.get(g, ()):
+                shared[tid] = shared.get(tid, 0) + 1
+        scored = []
+        for tid, n in shared.items():
+            score = n / len(grams)
+            if score >= min_score:
+                scored.append((round(score, 3), -self._size[tid], tid))
+        return [(tid, score) for score, _, tid in heapq.nlargest(limit, scored)]
+
+def parse_priority(value) -> int:
+    if value in (None, ""):
+        return PRIORITY_DEFAULT
+    if isinstance(value, bool) or not str(value).strip().lstrip("-").isdigit():
+        raise ValueError("priority must be an integer")
+    priority = int(value)
+    if not PRIORITY_MIN <= priority <= PRIORITY_MAX:
+        raise ValueError(f"priority must be between {PRIORITY_MIN} and {PRIORITY_MAX}")
+    return priority
+
+def parse_tags(value) -> list[str]:
+    """Tags as a list or a comma-separated string -> lowercase, unique, in order."""
+    if value in (None, ""):
+        return []
+    if isinstance(value, str):
+        value = value.split(",")
+    if not isinstance(value, list):
+        raise ValueError("tags must be a list")
+    tags = list(dict.fromkeys(t for t in (str(v).strip().lower() for v in value) if t))
+    if len(tags) > MAX_TAGS_PER_TASK:
+        raise ValueError(f"at most {MAX_TAGS_PER_TASK} tags per task")
+    return tags
+
+# --- Tag index ---
+NONZERO_BYTE = re.compile(rb"[^\x00]")
+
+class Bitmap:
+    """
+    Growable bitmap over task ids: a bytearray, so setting a bit is O(1), with
+    its big-integer form cached for queries until the next change.
+    """
+    __slots__ = ("bits", "_int")
+
+    def __init__(self) -> None:
+        self.bits = bytearray()
+        self._int: int | None = None
+
+    def set(self, i: int, on: bool = True) -> None:
+        self._int = None
+        byte = i >> 3
+        if byte >= len(self.bits):
+            if not on:
+                return
+            self.bits.extend(bytes(byte + 1 - len(self.bits) + len(self.bits) // 2))
+        if on:
+            self.bits[byte] |= 1 << (i & 7)
+        else:
+            self.bits[byte] &= ~(1 << (i & 7)) & 0xFF
+
+    def to_int(self) -> int:
+        # AND / OR / NOT on the int form run word by word in C
+        if self._int is None:
+            self._int = int.from_bytes(self.bits, "little")
+        return self._int
+
+class TagIndex:
+    """
+    Store index: tag -> bitmap of task ids, plus bitmaps of all live ids and of
+    done ids. A query is a few big-integer ANDs over these bitmaps; matching ids
+    come out in id (insertion) order.
+    """
+    def __init__(self) -> None:
+        self.tags: dict[str, Bitmap] = {}
+        self.counts: dict[str, int] = {}
+        self.live = Bitmap()
+        self.done = Bitmap()
+
+    def clear(self) -> None:
+        self.tags.clear(); self.counts.clear()
+        self.live, self.done = Bitmap(), Bitmap()
+
+    def add(self, tid: int, task: dict) -> None:
+        self.live.set(tid)
+        if task.get("done"):
+            self.done.set(tid)
+        for tag in task.get("tags") or ():
+            self.tags.setdefault(tag, Bitmap()).set(tid)
+            self.counts[tag] = self.counts.get(tag, 0) + 1
+
+    def remove(self, tid: int, task: dict) -> None:
+        self.live.set(tid, False)
+        self.done.set(tid, False)
+        for tag in task.get("tags") or ():
+            bm = self.tags.get(tag)
+            if bm is not None:
+                bm.set(tid, False)
+                self.counts[tag] -= 1
+                if not self.counts[tag]:
+                    del self.tags[tag], self.counts[tag]
+
+    def query(self, all_of=(), none_of=(), done: bool | None = None) -> int:
+        """Bitmap (as an int) of live ids carrying every tag of all_of and none of none_of."""
+        result = self.live.to_int()
+        for tag in all_of:
+            bm = self.tags.get(tag)
+            if bm is None:
+                return 0
+            result &= bm.to_int()
+        for tag in none_of:
+            bm = self.tags.get(tag)
+            if bm is not None:
+                result &= ~bm.to_int()
+        if done is not None:
+            result = result & self.done.to_int() if done else result & ~self.done.to_int()
+        return result
+
+    @staticmethod
+    def ids(bits: int, after: int = -1, limit: int = 50) -> list[int]:
+        """First `limit` set bits above `after`, lowest first."""
+        raw = bits.to_bytes((bits.bit_length() + 7) // 8, "little")
+        out, start = [], after + 1
+        # the regex engine skips runs of zero bytes in C
+        for match in NONZERO_BYTE.finditer(raw, start >> 3):
+            byte, pos = raw[match.start()], match.start() << 3
+            while byte:
+                bit = (byte & -byte).bit_length() - 1
+                if pos + bit >= start:
+                    out.append(pos + bit)
+                    if len(out) == limit:
+                        return out
+                byte &= byte - 1
+        return out
+
+# --- Subtask tree ---
+class TaskTree:
+    """
+    Store index of the parent/child hierarchy ('parent' holds the parent's title).
+    Only tasks that are part of a hierarchy (they have a parent, or subtasks) are
+    tracked; a plain task costs nothing here. Every tracked task has a
+    materialized path (tuple of normalized titles from its root); the paths are
+    kept sorted, so a subtree is one bisected slice.
+    Each node also keeps rolled-up counters (itself + descendants), adjusted
+    along the path when a task enters, leaves or changes state: O(depth).
+    A task whose parent does not exist is a root until that parent appears.
+    The remove+add pair of an in-place change is folded into a counter update,
+    so marking a project done does not re-path its subtree.
+    `lookup(key)` returns the store's task for a key (or None).
+    """
+    def __init__(self, lookup) -> None:
+        self.lookup = lookup
+        self.parent_of: dict[str, str] = {}
+        self.children: dict[str, set[str]] = {}   # parent key -> child keys (parent may be absent)
+        self.path: dict[str, tuple] = {}
+        self._paths: list[tuple] = []
+        self.roots: set[str] = set()
+        self.own: dict[str, int] = {}
+        self.total: dict[str, int] = {}
+        self.done: dict[str, int] = {}
+        self._pending: tuple | None = None        # (key, parent key) removed, maybe about to come back
+        self._bulk = False                         # rebuild(): _paths is sorted once at the end
+
+    @staticmethod
+    def _keys(task: dict) -> tuple[str, str | None]:
+        key = norm_title(task.get("title", ""))
+        parent = norm_title(task.get("parent") or "") or None
+        return key, (parent if parent != key else None)
+
+    def clear(self) -> None:
+        self.parent_of.clear(); self.children.clear(); self.path.clear(); self._paths.clear()
+        self.roots.clear(); self.own.clear(); self.total.clear(); self.done.clear()
+        self._pending = None
+
+    def _repath(self, key: str, path: tuple) -> None:
+        """Give `key` a new path and move its attached descendants along."""
+        stack = [(key, path)]
+        while stack:
+            k, p = stack.pop()
+            old = self.path.get(k)
+            if not self._bulk:
+                if old is not None:
+                    del self._paths[bisect.bisect_left(self._paths, old)]
+                bisect.insort(self._paths, p)
+            self.path[k] = p
+            if len(p) == 1:
+                self.roots.add(k)
+            else:
+                self.roots.discard(k)
+            for c in self.children.get(k, ()):
+                # move the children that hung below our old path, and adopt the
+                # ones waiting as roots (parent was missing, or was a descendant
+                # of theirs); never attach an ancestor
+                cp = self.path.get(c)
+                if cp is None or c in p:
+                    continue
+                if cp[:-1] == old:
+                    stack.append((c, p + (c,)))
+                elif cp == (c,):
+                    self._bump(p, self.total[c], self.done[c])
+                    stack.append((c, p + (c,)))
+
+    def _bump(self, path: tuple, total: int, done: int) -> None:
+        for a in path:
+            self.total[a] += total
+            self.done[a] += done
+
+    def _track(self, key: str, done: int) -> None:
+        """Start tracking a present top-level task that just got its first subtask."""
+        self.own[key] = self.done[key] = done
+        self.total[key] = 1
+        self.path[key] = (key,)
+        self.roots.add(key)
+        if not self._bulk:
+            bisect.insort(self._paths, (key,))
+
+    def _untrack(self, key: str) -> None:
+        """Stop tracking a top-level task whose last subtask left."""
+        del self._paths[bisect.bisect_left(self._paths, self.path.pop(key))]
+        self.roots.discard(key)
+        del self.own[key], self.total[key], self.done[key]
+
+    def add(self, tid: int, task: dict) -> None:
+        key, parent = self._keys(task)
+        done = int(bool(task.get("done")))
+        if self._pending == (key, parent):
+            self._pending = None
+            if key in self.path:
+                self._bump(self.path[key], 0, done - self.own[key])
+                self.own[key] = done
+            return
+        self.settle()
+        if not parent and key not in self.children:
+            return   # not part of a hierarchy
+        if parent:
+            self.parent_of[key] = parent
+            self.children.setdefault(parent, set()).add(key)
+            if parent not in self.path and (ptask := self.lookup(parent)) is not None:
+                self._track(parent, int(bool(ptask.get("done"))))
+        self.own[key] = self.done[key] = done
+        self.total[key] = 1
+        path = self.path[parent] + (key,) if parent in self.path else (key,)
+        self._bump(path[:-1], 1, done)
+        self._repath(key, path)   # adopts the subtasks that were waiting for this task
+
+    def rebuild(self, items) -> None:
+        self.clear()
+        # a parent loaded after its subtasks is not in the tree yet: it adopts them when added
+        lookup, seen = self.lookup, {}
+        self.lookup, self._bulk = seen.get, True
+        try:
+            for tid, task in items:
+                seen[norm_title(task.get("title", ""))] = task
+                self.add(tid, task)
+        finally:
+            self.lookup, self._bulk = lookup, False
+        self._paths = sorted(self.path.values())
+
+    def remove(self, tid: int, task: dict) -> None:
+        self.settle()
+        self._pending = self._keys(task)
+
+    def settle(self) -> None:
+        """Carry out a pending removal (the task did not come back)."""
+        if self._pending is None:
+            return
+        key, parent = self._pending
+        self._pending = None
+        if key not in self.path:
+            return
+        path = self.path.pop(key)
+        del self._paths[bisect.bisect_left(self._paths, path)]
+        self.roots.discard(key)
+        self._bump(path[:-1], -self.total.pop(key), -self.done.pop(key))
+        del self.own[key]
+        if parent:
+            self.parent_of.pop(key, None)
+            self.children[parent].discard(key)
+            if not self.children[parent]:
+                del self.children[parent]
+                if parent in self.path and parent not in self.parent_of:
+                    self._untrack(parent)
+        for c in list(self.children.get(key, ())):
+            if self.path.get(c, ())[:-1] == path:
+                self._repath(c, (c,))
+
+    def subtree(self, key: str) -> list[tuple[str, int]]:
+        """(key, depth below `key`) for the node and its descendants, in path order ([] if untracked)."""
+        self.settle()
+        path = self.path.get(key)
+        if path is None:
+            return []
+        lo = bisect.bisect_left(self._paths, path)
+        hi = bisect.bisect_left(self._paths, path[:-1] + (path[-1] + "\0",))
+        return [(p[-1], len(p) - len(path)) for p in self._paths[lo:hi]]
+
+    def progress(self, key: str) -> dict:
+        """Done/total over the descendants of `key` (or the task itself if it has none)."""
+        self.settle()
+        if key not in self.path:
+            total, done = 1, int(bool((self.lookup(key) or {}).get("done")))
+        else:
+            total, done = self.total[key] - 1, self.done[key] - self.own[key]
+            if not total:
+                total, done = 1, self.own[key]
+        return {"done": done, "total": total, "percent": round(100 * done / total)}
+
+    def children_of(self, key: str) -> list[str]:
+        self.settle()
+        return [c for c in self.children.get(key, ()) if c in self.path]
+
+    def depth(self, key: str) -> int:
+        self.settle()
+        return len(self.path[key]) if key in self.path else int(self.lookup(key) is not None)
+
+    def is_ancestor(self, key: str, of: str) -> bool:
+        self.settle()
+        return key in self.path.get(of, (of,))
+
+    def projects(self) -> list[str]:
+        """Root tasks that have subtasks."""
+        self.settle()
+        return sorted(k for k in self.roots if self.total[k] > 1)
+
+# --- Next-up queue ---
+class NextUpQueue:
+    """
+    Store index of open tasks ordered by (priority, due, created, title), as a
+    binary heap with lazy deletion. Every entry is its own tuple (key fields +
+    id) and `_live` maps an id to its current entry, so an entry is stale unless
+    it is that very object; remove() only forgets it. The number of stale
+    entries is therefore known exactly: stale entries reaching the root are
+    popped right away, and the heap is rebuilt from the live entries once more
+    than a quarter of it is stale. top(k) walks the heap array best-first with a
+    small frontier heap, so it costs O(k log k) plus the stale entries it meets.
+    """
+    def __init__(self) -> None:
+        self._heap: list[tuple] = []
+        self._live: dict[int, tuple] = {}
+
+    @staticmethod
+    def key(task: dict) -> tuple:
+        return (task.get("priority") or PRIORITY_DEFAULT, task.get("due") or "~",
+                task.get("created") or "", norm_title(task.get("title", "")))
+
+    def clear(self) -> None:
+        self._heap.clear(); self._live.clear()
+
+    def add(self, tid: int, task: dict) -> None:
+        if task.get("done"):
+            return
+        entry = self.key(task) + (tid,)
+        self._live[tid] = entry
+        heapq.heappush(self._heap, entry)
+
+    def remove(self, tid: int, task: dict) -> None:
+        if self._live.pop(tid, None) is None:
+            return
+        heap = self._heap
+        while heap and self._live.get(heap[0][-1]) is not heap[0]:
+            heapq.heappop(heap)
+        if len(heap) - len(self._live) > len(self._live) // 3 + 16:
+            self._heap = list(self._live.values())
+            heapq.heapify(self._heap)
+
+    def __len__(self) -> int:
+        return len(self._live)
+
+    def top(self, k: int) -> list[int]:
+        heap, out = self._heap, []
+        frontier = [(heap[0], 0)] if heap else []
+        while frontier and len(out) < k:
+            entry, i = heapq.heappop(frontier)
+            if self._live.get(entry[-1]) is entry:
+                out.append(entry[-1])
+            for child in (2 * i + 1, 2 * i + 2):
+                if child < len(heap):
+                    heapq.heappush(frontier, (heap[child], child))
+        return out
+
+# --- Due-date index ---
+class DueIndex:
+    """
+    Store index: sorted list of (due, id) for tasks that have a due date, so a
+    date range is two bisections plus the matching slice.
+    """
+    def __init__(self) -> None:
+        self._sorted: list[tuple[str, int]] = []
+
+    def clear(self) -> None:
+        self._sorted.clear()
+
+    def rebuild(self, items) -> None:
+        self._sorted = sorted((task["due"], tid) for tid, task in items if task.get("due"))
+
+    def add(self, tid: int, task: dict) -> None:
+        if task.get("due"):
+            bisect.insort(self._sorted, (task["due"], tid))
+
+    def remove(self, tid: int, task: dict) -> None:
+        if task.get("due"):
+            i = bisect.bisect_left(self._sorted, (task["due"], tid))
+            if i < len(self._sorted) and self._sorted[i] == (task["due"], tid):
+                del self._sorted[i]
+
+    def between(self, after: str | None = None, before: str | None = None) -> list[int]:
+        """Ids with after <= due < before, earliest first."""
+        lo = bisect.bisect_left(self._sorted, (after, -1)) if after else 0
+        hi = bisect.bisect_left(self._sorted, (before, -1)) if before else len(self._sorted)
+        return [tid for _, tid in self._sorted[lo:hi]]
+
+TASK_SORT_KEYS = {
+    "created": lambda t: t.get("created") or "",
+    "title": lambda t: norm_title(t.get("title", "")),
+    "category": lambda t: (t.get("category") or "general").lower(),
+    "done": lambda t: int(bool(t.get("done"))),
+    "due": lambda t: t.get("due") or "~",   # tasks without a due date last
+    "priority": lambda t: t.get("priority") or PRIORITY_DEFAULT,
+}
+
+class SortIndex:
+    """
+    Store index: for each TASK_SORT_KEYS key that has been asked for, a sorted
+    list of (sort value, normalized title, id), so a page is one bisection to
+    the cursor plus a walk over the entries after it. An order is built on
+    first use and from then on kept current by add()/remove(); keys nobody
+    sorts by cost no memory.
+    """
+    def __init__(self, items) -> None:
+        self._items = items         # () -> (id, task) pairs of the whole store
+        self._orders: dict[str, list[tuple]] = {}
+
+    @staticmethod
+    def _entry(key: str, tid: int, task: dict) -> tuple:
+        return (TASK_SORT_KEYS[key](task), norm_title(task.get("title", "")), tid)
+
+    def clear(self) -> None:
+        self._orders.clear()
+
+    def rebuild(self, items) -> None:
+        self._orders.clear()        # rebuilt lazily by the next walk()
+
+    def add(self, tid: int, task: dict) -> None:
+        for key, order in self._orders.items():
+            bisect.insort(order, self._entry(key, tid, task))
+
+    def remove(self, tid: int, task: dict) -> None:
+        for key, order in self._orders.items():
+            entry = self._entry(key, tid, task)
+            i = bisect.bisect_left(order, entry)
+            if i < len(order) and order[i] == entry:
+                del order[i]
+
+    def walk(self, key: str, desc: bool = False, after: tuple | None = None):
+        """Entries in sort order (reversed if desc), starting right after the position `after`."""
+        order = self._orders.get(key)
+        if order is None:
+            order = self._orders[key] = sorted(self._entry(key, tid, task) for tid, task in self._items())
+        if desc:
+            i = bisect.bisect_left(order, tuple(after)) if after else len(order)
+            for i in range(i - 1, -1, -1):
+                yield order[i]
+        else:
+            # (value, title) sorts before any (value, title, id), so step past it
+            i = bisect.bisect_left(order, (*after, sys.maxsize)) if after else 0
+            for i in range(i, len(order)):
+                yield order[i]
+
+# --- Store ---
+class TaskStore:
+    """
+    Process-resident task list. The backend is only used as durable backing;
+    every lookup goes through a normalized-title -> id hash index, so finding,
+    toggling and deleting a task are O(1).
+    Handlers wrap check-then-modify sequences in `with STORE.lock:`.
+    Each mutation is expressed as a journal operation (add/edit/mark/delete/
+    import/merge/clear), applied in memory and then handed to the backend; if
+    the backend cannot persist it, the store is reloaded from the backend.
+    Secondary indexes (`self.indexes`) see every task enter (add) and leave
+    (remove) the store; an in-place change is a remove followed by an add.
+    An index may also provide rebuild(items) to bulk-load the whole store.
+    """
+    def __init__(self, backend) -> None:
+        self.lock = threading.RLock()
+        self.backend = backend
+        self._tasks: dict[int, dict] = {}   # id -> task (insertion ordered)
+        self._index: dict[str, int] = {}    # normalized title -> id
+        self._next_id = 0
+        self.categories = CategoryRegistry(backend, self.lock)
+        self.search = TitleSearchIndex()
+        self.due = DueIndex()
+        self.next_up = NextUpQueue()
+        self.tags = TagIndex()
+        self.tree = TaskTree(self.get)
+        self.order = SortIndex(self._tasks.items)
+        self.indexes = [self.categories, self.search, self.due, self.next_up, self.tags, self.tree, self.order]
+        # bumped on every mutation; (epoch, version) is the ETag of the data set
+        self.epoch = ""
+        self.version = 0
+        # exact time of the last change; Last-Modified only carries its second
+        self.modified = datetime.now(timezone.utc)
+        # normalized title -> version of its last change, oldest first; titles of
+        # deleted keys are kept as tombstones. Versions <= _floor are not covered.
+        self._changes: OrderedDict[str, int] = OrderedDict()
+        self._tombstones: dict[str, str] = {}
+        self._floor = 0
+        self._unbacked_ops = 0
+        self._backing_up = False
+        # called as listener(previous version, touched keys or None) after each commit/reload
+        self.listeners: list = []
+
+    def load(self) -> None:
+        with self.lock:
+            self.categories.load()
+            self.backend.load(self)
+            self._forget_changes()
+
+    def sync(self) -> None:
+        """Catch up with what other processes committed to the shared backend since our last look."""
+        with self.lock:
+            if not self.backend.changed_externally():
+                return
+            delta = self.backend.changes_after()
+            if delta is None:
+                self._reload()
+                return
+            revision = self.categories.revision
+            self.categories.merge(self.backend.load_categories())
+            version, log, rows = delta
+            if log:
+                self._apply_rows(version, log, rows)
+            elif revision != self.categories.revision:
+                # categories-only write: let listeners push the new list
+                for listener in self.listeners:
+                    listener(self.version, {})
+
+    def _apply_rows(self, version: int, log: list, rows: dict) -> None:
+        """
+        Apply rows committed by another worker: `log` holds (key, previous key of a
+        rename) in commit order, `rows` the current data of every key involved
+        (missing once deleted). Renames move the id first, so the task keeps its place.
+        """
+        prev, touched = self.version, {}
+        for key, old in log:
+            for k in (old, key):
+                if k and k not in touched:
+                    tid = self._index.get(k)
+                    touched[k] = self._tasks[tid].get("title", k) if tid is not None else k
+            if old and old in self._index and key not in self._index:
+                self._index[key] = self._index.pop(old)
+        for key in touched:
+            data, tid = rows.get(key), self._index.get(key)
+            if data is None:
+                if tid is not None:
+                    del self._index[key]
+                    task = self._tasks.pop(tid)
+                    for idx in self.indexes:
+                        idx.remove(tid, task)
+            elif tid is None:
+                touched[key] = self._insert(Task(json.loads(data)))["title"]
+            else:
+                self._replace(tid, Task(json.loads(data)))
+        self.version = version
+        self.modified = datetime.now(timezone.utc)
+        self._record_changes(touched)
+        for listener in self.listeners:
+            listener(prev, touched)
+
+    def _reload(self) -> None:
+        prev = self.version
+        self.categories.load()
+        self.backend.load(self)
+        self.modified = datetime.now(timezone.utc)
+        self._forget_changes()
+        for listener in self.listeners:
+            listener(prev, None)
+
+    def _forget_changes(self) -> None:
+        self._changes.clear(); self._tombstones.clear()
+        self._floor = self.version
+
+    def changes_since(self, since: int) -> dict | None:
+        """
+        Tasks changed and titles deleted after `since`, newest change last.
+        Walks the change log backwards, so the cost is O(#changes), not O(#tasks).
+        Returns None when `since` is older than what the log still covers.
+        """
+        with self.lock:
+            if since < self._floor or since > self.version:
+                return None
+            changed, deleted = [], []
+            for key in reversed(self._changes):
+                if self._changes[key] <= since:
+                    break
+                task = self.get(key)
+                if task is None:
+                    deleted.append(self._tombstones[key])
+                else:
+                    changed.append(task)
+            changed.reverse(); deleted.reverse()
+            return {"changed": changed, "deleted": deleted}
+
+    def _reset(self, tasks: list[dict]) -> None:
+        # ids restart from 0, so the id-keyed indexes (tag bitmaps...) size with the live tasks
+        self._tasks.clear(); self._index.clear()
+        self._next_id = 0
+        for t in tasks:
+            # keep the first occurrence of a title, like the old linear scan did
+            if isinstance(t, Mapping) and norm_title(t.get("title", "")) not in self._index:
+                self._insert(t, indexed=False)
+        for idx in self.indexes:
+            if hasattr(idx, "rebuild"):
+                idx.rebuild(self._tasks.items())
+            else:
+                idx.clear()
+                for tid, task in self._tasks.items():
+                    idx.add(tid, task)
+
+    def _insert(self, task: Mapping, indexed: bool = True) -> Task:
+        if not isinstance(task, Task):
+            task = Task(task)
+        task.setdefault("version", 1)
+        tid = self._next_id; self._next_id += 1
+        self._tasks[tid] = task
+        self._index[norm_title(task.get("title", ""))] = tid
+        if indexed:
+            for idx in self.indexes:
+                idx.add(tid, task)
+        return task
+
+    def _replace(self, tid: int, task: Task) -> Task:
+        for idx in self.indexes:
+            idx.remove(tid, self._tasks[tid])
+        self._tasks[tid] = task
+        for idx in self.indexes:
+            idx.add(tid, task)
+        return task
+
+    def _change(self, tid: int, changes: dict) -> dict:
+        task = self._tasks[tid]
+        for idx in self.indexes:
+            idx.remove(tid, task)
+        task.update(changes)
+        for idx in self.indexes:
+            idx.add(tid, task)
+        return task
+
+    def __len__(self) -> int:
+        return len(self._tasks)
+
+    @property
+    def etag(self) -> str:
+        return f"{self.epoch}-{self.version}"
+
+    def all(self) -> list[dict]:
+        with self.lock:
+            return list(self._tasks.values())
+
+    def get(self, title: str) -> dict | None:
+        tid = self._index.get(norm_title(title))
+        return None if tid is None else self._tasks.get(tid)
+
+    def by_id(self, tid: int) -> dict | None:
+        return self._tasks.get(tid)
+
+    def check_version(self, title: str, expected: int | None) -> None:
+        """Raise VersionConflict unless `title` is at version `expected` (None: no check)."""
+        task = self.get(title)
+        if expected is not None and task is not None and task.get("version", 1) != expected:
+            raise VersionConflict(task["title"])
+
+    # public mutations: apply in memory, then persist through the backend
+    def add(self, task: dict) -> dict:
+        with self.lock:
+            self._commit({"op": "add", "task": task})
+        return task
+
+    def update(self, title: str, changes: dict, expected: int | None = None) -> dict | None:
+        """
+        Apply field changes to one task; a new 'title' re-keys the index in place
+        and is carried over to the 'parent' of its subtasks (in the same operation).
+        """
+        with self.lock:
+            if self.get(title) is None:
+                return None
+            self.check_version(title, expected)
+            op = {"op": "edit", "title": title, "changes": changes}
+            kids = self.tree.children_of(norm_title(title))
+            if kids and norm_title(changes.get("title", title)) != norm_title(title):
+                ops = [op] + [{"op": "edit", "title": self.get(k)["title"], "changes": {"parent": changes["title"]}} for k in kids]
+                return self._commit({"op": "batch", "ops": ops})[0]
+            return self._commit(op)
+
+    def mark(self, titles: list[str], done: bool, expected: dict | None = None) -> int:
+        """
+        Set 'done' on several tasks; only tasks that actually change are persisted.
+        `expected` maps titles to the versions they must still have.
+        """
+        with self.lock:
+            for title, version in (expected or {}).items():
+                self.check_version(str(title), version)
+            changed = []
+            for title in titles:
+                task = self.get(str(title))
+                if task is not None and task.get("done", False) != done:
+                    changed.append(task["title"])
+            if changed:
+                self._commit({"op": "mark", "titles": changed, "done": done, "at": now_iso()})
+            return len(changed)
+
+    def delete(self, title: str, expected: int | None = None) -> dict | None:
+        """Delete one task; its subtasks move up to its own parent."""
+        with self.lock:
+            task = self.get(title)
+            if task is None:
+                return None
+            self.check_version(title, expected)
+            kids = self.tree.children_of(norm_title(title))
+            if kids:
+                ops = [{"op": "edit", "title": self.get(k)["title"], "changes": {"parent": task.get("parent")}} for k in kids]
+                return self._commit({"op": "batch", "ops": ops + [{"op": "delete", "title": title}]})[-1]
+            return self._commit({"op": "delete", "title": title})
+
+    def replace(self, tasks: list[dict]) -> None:
+        with self.lock:
+            self._commit({"op": "import", "tasks": tasks} if tasks else {"op": "clear"})
+
+    def batch(self, ops: list[dict]) -> list:
+        """Apply several validated operations as one atomic operation (one persist)."""
+        with self.lock:
+            return self._commit({"op": "batch", "ops": ops}) if ops else []
+
+    def merge(self, tasks: list[dict]) -> None:
+        """Upsert several tasks by title in one operation (existing tasks keep their position)."""
+        with self.lock:
+            if tasks:
+                self._commit({"op": "merge", "tasks": tasks})
+
+    def _commit(self, op: dict):
+        touched, prev = self._touched(op), self.version
+        self._stamp(op, {}, op.setdefault("expect", {}) if touched is not None else {})
+        result = self._apply(op)
+        try:
+            self.version = self.backend.write(op) or self.version + 1
+        except BaseException:
+            # not persisted (our copy was stale, the database was locked, an I/O
+            # error...): drop the local change and take the backend's state
+            self._reload()
+            raise
+        self.modified = datetime.now(timezone.utc)
+        self._record_changes(touched)
+        for listener in self.listeners:
+            listener(prev, touched)
+        self._unbacked_ops += 1
+        if not self._backing_up and self._unbacked_ops >= BACKUP_EVERY_OPS:
+            self._backing_up = True
+            threading.Thread(target=self.backup, name="tasks-backup", daemon=True).start()
+        return result
+
+    def _stamp(self, op: dict, seen: dict[str, int], expect: dict) -> None:
+        """
+        Write the new per-task versions into the operation (so replaying it is
+        idempotent) and record in `expect` the version each touched task has now,
+        for the backend's compare-and-swap. `seen` carries versions across the
+        operations of a batch.
+        """
+        def bump(title: str, new_title: str | None = None) -> int:
+            key = norm_title(title)
+            task = self.get(title)
+            current = seen.get(key, task.get("version", 1) if task is not None else 0)
+            expect.setdefault(key, task.get("version", 1) if task is not None else None)
+            seen[norm_title(new_title or title)] = current + 1
+            return current + 1
+        kind = op["op"]
+        if kind == "add":
+            op["task"]["version"] = bump(op["task"].get("title", ""))
+        elif kind == "edit":
+            op["changes"]["version"] = bump(op["title"], op["changes"].get("title"))
+        elif kind == "mark":
+            op["versions"] = [bump(t) for t in op["titles"]]
+        elif kind == "delete":
+            bump(op["title"])
+        elif kind == "merge":
+            for t in op["tasks"]:
+                t["version"] = bump(t.get("title", ""))
+        elif kind == "batch":
+            for sub in op["ops"]:
+                self._stamp(sub, seen, expect)
+        elif kind == "import":
+            for t in op["tasks"]:
+                t.setdefault("version", 1)
+
+    def _touched(self, op: dict) -> dict[str, str] | None:
+        """Keys (-> current title) an operation is about to change; None means 'everything'."""
+        kind = op["op"]
+        if kind == "add":
+            titles = [op["task"].get("title", "")]
+        elif kind == "edit":
+            titles = [op["title"], op["changes"].get("title") or op["title"]]
+        elif kind == "mark":
+            titles = op["titles"]
+        elif kind == "delete":
+            titles = [op["title"]]
+        elif kind == "merge":
+            titles = [t.get("title", "") for t in op["tasks"]]
+        elif kind == "batch":
+            touched = {}
+            for sub in op["ops"]:
+                for key, title in (self._touched(sub) or {}).items():
+                    touched.setdefault(key, title)
+            return touched
+        else:
+            return None
+        return {norm_title(t): (self.get(t) or {}).get("title", t) for t in titles}
+
+    def _record_changes(self, touched: dict[str, str] | None) -> None:
+        if touched is None:
+            self._forget_changes()
+            return
+        for key, title in touched.items():
+            if key in self._index:
+                self._tombstones.pop(key, None)
+            else:
+                self._tombstones[key] = title
+            self._changes[key] = self.version
+            self._changes.move_to_end(key)
+        while len(self._changes) > CHANGE_LOG_MAX:
+            key, version = self._changes.popitem(last=False)
+            self._tombstones.pop(key, None)
+            self._floor = version
+
+    def _apply(self, op: dict):
+        """Apply one operation to memory. Also used for journal replay, so it must be idempotent."""
+        kind = op["op"]
+        if kind == "add":
+            task = op["task"]
+            tid = self._index.get(norm_title(task.get("title", "")))
+            if tid is None:
+                return self._insert(task)
+            task = Task(task)
+            task.setdefault("version", self._tasks[tid].get("version", 1) + 1)
+            return self._replace(tid, task)
+        if kind == "edit":
+            key = norm_title(op["title"])
+            tid = self._index.get(key)
+            if tid is None:
+                return None
+            task, changes = self._tasks[tid], op["changes"]
+            new_key = norm_title(changes.get("title", task.get("title", "")))
+            if new_key != key:
+                if new_key in self._index:
+                    raise ValueError("duplicate title")
+                del self._index[key]
+                self._index[new_key] = tid
+            return self._change(tid, changes)
+        if kind == "mark":
+            done = bool(op["done"])
+            for i, title in enumerate(op["titles"]):
+                tid = self._index.get(norm_title(title))
+                if tid is not None:
+                    # 'completed' is when the task was last closed; re-marking keeps it
+                    task = self._tasks[tid]
+                    completed = (task.get("completed") if task.get("done") else op.get("at")) if done else None
+                    version = op["versions"][i] if "versions" in op else task.get("version", 1) + 1
+                    self._change(tid, {"done": done, "completed": completed, "version": version})
+            return len(op["titles"])
+        if kind == "delete":
+            tid = self._index.pop(norm_title(op["title"]), None)
+            if tid is None:
+                return None
+            task = self._tasks.pop(tid)
+            for idx in self.indexes:
+                idx.remove(tid, task)
+            return task
+        if kind == "import":
+            self._reset(op["tasks"])
+            return None
+        if kind == "merge":
+            for task in op["tasks"]:
+                tid = self._index.get(norm_title(task.get("title", "")))
+                if tid is None:
+                    self._insert(task)
+                else:
+                    self._change(tid, task)
+            return len(op["tasks"])
+        if kind == "clear":
+            self._reset([])
+            return None
+        if kind == "batch":
+            return [self._apply(sub) for sub in op["ops"]]
+        raise ValueError(f"unknown journal op {kind!r}")
+
+    def backup(self) -> dict | None:
+        """Take a deduplicated backup of the current task list (serialized outside the lock)."""
+        try:
+            with self.lock:
+                snapshot = [dict(t) for t in self._tasks.values()]
+                self._unbacked_ops = 0
+            return create_backup(snapshot)
+        finally:
+            self._backing_up = False
+
+    def backup_if_dirty(self) -> None:
+        if self._unbacked_ops and not self._backing_up:
+            self._backing_up = True
+            self.backup()
+
+def archive_done_tasks(days: int) -> int:
+    """
+    Move tasks done more than `days` ago ('completed', or 'created' for tasks
+    closed before completion times were kept) to the archive, then remove them
+    from the store in one operation. Tasks that still have subtasks stay.
+    Returns the number of archived tasks.
+    """
+    cutoff = (datetime.now() - timedelta(days=days)).isoformat(timespec="seconds")
+    # held from selection to delete, and after catching up with other workers'
+    # commits, so two workers never archive the same tasks
+    with ARCHIVE_LOCK, STORE.lock:
+        STORE.sync()
+        old = [t for t in STORE.all()
+               if t.get("done") and (t.get("completed") or t.get("created") or "") < cutoff
+               and not STORE.tree.children_of(norm_title(t["title"]))]
+        if not old:
+            return 0
+        # written (and synced) before the tasks leave the store: a crash in between
+        # leaves a duplicate in the archive, never a lost task
+        archive_tasks([dict(t) for t in old])
+        STORE.batch([{"op": "delete", "title": t["title"]} for t in old])
+    return len(old)
+
+def backup_scheduler() -> None:
+    while True:
+        time.sleep(BACKUP_INTERVAL)
+        try:
+            STORE.backup_if_dirty()
+        except Exception:
+            APP.logger.exception("scheduled backup failed")
+        if ARCHIVE_AFTER_DAYS > 0:
+            try:
+                archive_done_tasks(ARCHIVE_AFTER_DAYS)
+            except Exception:
+                APP.logger.exception("scheduled archiving failed")
+
+STORE = TaskStore(make_backend())
+STORE.load()
+STORE.backup()
+atexit.register(STORE.categories.flush)
+threading.Thread(target=backup_scheduler, name="tasks-backup-scheduler", daemon=True).start()
+
+@APP.before_request
+def sync_store():
+    STORE.sync()
+
+# --- Live events (SSE) ---
+class EventBroadcaster:
+    """
+    Fan-out of store changes to Server-Sent Events clients. Every client has a
+    bounded queue: a client that cannot keep up has its backlog replaced by a
+    single 'reset' event instead of slowing down writers. The last SSE_HISTORY
+    events are kept, so a reconnecting client (Last-Event-ID) only receives what
+    it missed. Idle clients just wait on their queue between heartbeats.
+
+    Events: 'change' {version, since, changed, deleted, done_total},
+    'categories' [names] and 'reset' (reload everything).
+    """
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._clients: set[queue.Queue] = set()
+        self._history: deque[tuple[int, str]] = deque(maxlen=SSE_HISTORY)
+        self._categories_revision = 0
+
+    @staticmethod
+    def _message(event: str, data, version: int) -> str:
+        return f"id: {STORE.epoch}-{version}\nevent: {event}\ndata: {json.dumps(data, ensure_ascii=False, default=task_json)}\n\n"
+
+    def on_commit(self, prev_version: int, touched: dict[str, str] | None) -> None:
+        """Store listener, called under STORE.lock after every commit or reload."""
+        version = STORE.version
+        if touched is None or len(touched) > SSE_MAX_DELTA:
+            msg = self._message("reset", {"version": STORE.etag}, version)
+        else:
+            changed, deleted = [], []
+            for key, title in touched.items():
+                task = STORE.get(key)
+                if task is None:
+                    deleted.append(title)
+                else:
+                    changed.append(task)
+            msg = self._message("change", {"version": STORE.etag, "since": f"{STORE.epoch}-{prev_version}",
+                                           "changed": changed, "deleted": deleted,
+                                           "done_total": STORE.categories.done_total}, version)
+        if STORE.categories.revision != self._categories_revision:
+            self._categories_revision = STORE.categories.revision
+            msg += self._message("categories", STORE.categories.listing(), version)
+        self.publish(version, msg)
+
+    def publish(self, version: int, msg: str) -> None:
+        with self._lock:
+            self._history.append((version, msg))
+            for q in self._clients:
+                try:
+                    q.put_nowait(msg)
+                except queue.Full:
+                    self._reset_client(q)
+
+    def _reset_client(self, q: queue.Queue) -> None:
+        while True:
+            try:
+                q.get_nowait()
+            except queue.Empty:
+                break
+        q.put_nowait(self._message("reset", {"version": STORE.etag}, STORE.version))
+
+    def subscribe(self, last_id: str | None) -> queue.Queue:
+        q = queue.Queue(SSE_QUEUE_SIZE)
+        with self._lock:
+            if last_id:
+                try:
+                    since = parse_version(last_id)
+                except ValueError:
+                    since = None
+                oldest = self._history[0][0] if self._history else STORE.version + 1
+                if since is None or since < oldest - 1 or since > STORE.version:
+                    self._reset_client(q)
+                else:
+                    missed = [msg for v, msg in self._history if v > since]
+                    if len(missed) >= SSE_QUEUE_SIZE:
+                        self._reset_client(q)
+                    else:
+                        for msg in missed:
+                            q.put_nowait(msg)
+            self._clients.add(q)
+        return q
+
+    def unsubscribe(self, q: queue.Queue) -> None:
+        with self._lock:
+            self._clients.discard(q)
+
+    def notify(self, event: str, data) -> None:
+        """Send an event to the connected clients only: no id, not kept for replay."""
+        msg = f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+        with self._lock:
+            for q in self._clients:
+                try:
+                    q.put_nowait(msg)
+                except queue.Full:
+                    self._reset_client(q)
+
+    def stream(self, q: queue.Queue):
+        try:
+            yield f"retry: {SSE_RETRY_MS}\n\n"
+            while True:
+                try:
+                    yield q.get(timeout=SSE_HEARTBEAT)
+                except queue.Empty:
+                    # also picks up changes committed by other worker processes
+                    STORE.sync()
+                    yield ": ping\n\n"
+        finally:
+            self.unsubscribe(q)
+
+EVENTS = EventBroadcaster()
+STORE.listeners.append(EVENTS.on_commit)
+
+# --- Reminders ---
+class ReminderScheduler:
+    """
+    Fires a reminder when an open task reaches its due date. It is a store index,
+    so every task that enters the store with a future due date is pushed on a
+    min-heap of (timestamp, id, due); the thread sleeps until the head is due and
+    is woken only when an earlier entry arrives. Entries are invalidated lazily:
+    a popped entry fires only if the task still exists, is open and still has
+    that due date. Each reminder is handed to every sink (callable(task)).
+    Due dates already past when a task is loaded or saved are not reminded.
+    Every worker process runs a scheduler: `local_sinks` (SSE, whose clients are
+    per worker) fire in each of them, the other sinks only in the worker that
+    claims the reminder through the backend, so they fire once.
+    """
+    def __init__(self, sinks: list | None = None, local_sinks: list | None = None) -> None:
+        self.sinks = list(sinks or [])
+        self.local_sinks = list(local_sinks or [])
+        self._heap: list[tuple[float, int, str]] = []
+        self._pending: dict[int, str] = {}   # id -> due date it is scheduled for
+        self._cond = threading.Condition()
+
+    def clear(self) -> None:
+        with self._cond:
+            self._heap.clear(); self._pending.clear()
+
+    def add(self, tid: int, task: dict) -> None:
+        due = task.get("due")
+        if not due or task.get("done") or self._pending.get(tid) == due:
+            return
+        try:
+            at = datetime.fromisoformat(parse_due(due)).timestamp()
+        except (TypeError, ValueError):
+            APP.logger.warning("task %r has an invalid due date %r: no reminder", task.get("title"), due)
+            return
+        if at <= time.time():
+            return
+        with self._cond:
+            self._pending[tid] = due
+            heapq.heappush(self._heap, (at, tid, due))
+            if self._heap[0][1] == tid:
+                self._cond.notify()
+
+    def remove(self, tid: int, task: dict) -> None:
+        pass   # lazy: checked when the entry comes up
+
+    def _next_due(self) -> list[tuple[int, str]]:
+        with self._cond:
+            while not self._heap or self._heap[0][0] > time.time():
+                self._cond.wait(self._heap[0][0] - time.time() if self._heap else None)
+            fired = []
+            while self._heap and self._heap[0][0] <= time.time():
+                _, tid, due = heapq.heappop(self._heap)
+                if self._pending.get(tid) == due:
+                    del self._pending[tid]
+                    fired.append((tid, due))
+            return fired
+
+    def run(self) -> None:
+        while True:
+            fired = self._next_due()
+            with STORE.lock:
+                reminders = []
+                try:
+                    STORE.sync()
+                    for tid, due in fired:
+                        t = STORE.by_id(tid)
+                        if t is not None and t.get("due") == due and not t.get("done"):
+                            claimed = STORE.backend.claim_reminder(norm_title(t["title"]), due)
+                            reminders.append((dict(t), self.local_sinks + self.sinks if claimed else self.local_sinks))
+                except Exception:
+                    APP.logger.exception("reminder check failed")
+            for task, sinks in reminders:
+                for sink in sinks:
+                    try:
+                        sink(task)
+                    except Exception:
+                        APP.logger.exception("reminder sink failed")
+
+def log_reminder(task: dict) -> None:
+    logging.getLogger("todo.reminders").warning("Task due: %s (%s)", task["title"], task["due"])
+
+def sse_reminder(task: dict) -> None:
+    EVENTS.notify("reminder", task)
+
+def webhook_reminder(task: dict) -> None:
+    """Minimal webhook: POST the task as JSON to TODO_REMINDER_WEBHOOK."""
+    if not REMINDER_WEBHOOK_URL:
         return
-    cats = load_categories()
-    if cat not in cats:
-        cats.append(cat)
-        save_categories(cats)
+    req = urllib.request.Request(REMINDER_WEBHOOK_URL, data=json.dumps({"event": "reminder", "task": task}).encode("utf-8"),
+                                 headers={"Content-Type": "application/json"}, method="POST")
+    urllib.request.urlopen(req, timeout=5).close()
+
+REMINDER_SINK_TYPES = {"log": log_reminder, "sse": sse_reminder, "webhook": webhook_reminder}
+REMINDERS = ReminderScheduler([REMINDER_SINK_TYPES[name] for name in REMINDER_SINKS if name in REMINDER_SINK_TYPES and name != "sse"],
+                              [sse_reminder] if "sse" in REMINDER_SINKS else [])
+with STORE.lock:
+    STORE.indexes.append(REMINDERS)
+    for tid, task in STORE._tasks.items():
+        REMINDERS.add(tid, task)
+threading.Thread(target=REMINDERS.run, name="task-reminders", daemon=True).start()
+
+# --- Query helpers ---
+def parse_bool(value: str | None) -> bool | None:
+    if value is None or value == "":
+        return None
+    return value.strip().lower() in ("1", "true", "yes", "done")
+
+def encode_cursor(value, key: str) -> str:
+    return base64.urlsafe_b64encode(json.dumps([value, key]).encode("utf-8")).decode("ascii")
+
+def decode_cursor(cursor: str) -> tuple:
+    value, key = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+    return value, key
+
+def query_tasks(store, category: str = "", done: bool | None = None, q: str = "",
+                sort: str = "created", limit: int = 50, cursor: str = "") -> dict:
+    """
+    Filter, sort and page tasks; call with store.lock held. Pages are keyed by
+    (sort value, normalized title), so a cursor keeps its place when tasks are
+    added or removed in between.
+    A page is read off the store's sort index from the cursor on. Without q the
+    total comes from the category registry's counts, so nothing is scanned; with
+    q the matches are the title trigram index's candidates whose title really
+    contains q, and when they are few they are heap-selected instead of walked to.
+    """
+    desc = sort.startswith("-")
+    key = sort.lstrip("-")
+    after = tuple(decode_cursor(cursor)) if cursor else None
+    q = q.strip().lower()
+
+    def wanted(t) -> bool:
+        return ((not category or (t.get("category") or "general") == category)
+                and (done is None or bool(t.get("done")) == done))
+
+    found = None
+    if q:
+        ids = store.search.containing(q)
+        if ids is None:     # no three-letter run to look up: check every title
+            ids = [entry[2] for entry in store.order.walk(key)]
+        found = set()
+        for tid in ids:
+            t = store.by_id(tid)
+            if wanted(t) and q in t.get("title", "").lower():
+                found.add(tid)
+        matched = len(found)
+    else:
+        cats = store.categories
+        total, done_n = (cats.counts.get(category, 0), cats.done.get(category, 0)) if category \
+            else (cats.total, cats.done_total)
+        matched = total if done is None else done_n if done else total - done_n
+    # walking visits about limit * len(store) / matches entries
+    if found is not None and len(found) ** 2 < len(store) * limit:
+        sort_fn = TASK_SORT_KEYS[key]
+        candidates = []
+        for tid in found:
+            t = store.by_id(tid)
+            pos = (sort_fn(t), norm_title(t.get("title", "")))
+            if after is None or (pos > after if not desc else pos < after):
+                candidates.append((pos, t))
+        select = heapq.nlargest if desc else heapq.nsmallest
+        page = select(limit + 1, candidates, key=lambda c: c[0])
+    else:
+        page = []
+        for entry in store.order.walk(key, desc, after):
+            if entry[2] in found if found is not None else wanted(store.by_id(entry[2])):
+                page.append((entry[:2], store.by_id(entry[2])))
+                if len(page) > limit:
+                    break
+    next_cursor = encode_cursor(*page[limit - 1][0]) if len(page) > limit else None
+    return {"items": [t for _, t in page[:limit]], "next_cursor": next_cursor, "total": matched}
+
+def conditional(view=None, *, extra=None):
+    """
+    Conditional GET for views whose output only depends on the store: answers
+    304 from the in-memory version (If-None-Match / If-Modified-Since) before the
+    view runs, otherwise tags the response with ETag and Last-Modified.
+    For views that also depend on other state, extra() is appended to the ETag
+    (and If-Modified-Since alone is not trusted).
+    If-None-Match wins whenever it is sent. If-Modified-Since has whole-second
+    granularity, so it only matches when the last change happened before that
+    second began: a write later in the same second would otherwise be missed.
+    """
+    if view is None:
+        return lambda v: conditional(v, extra=extra)
+
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        etag, modified = STORE.etag, STORE.modified
+        if extra is not None:
+            etag = f"{etag}-{extra()}"
+        if request.if_none_match:
+            fresh = request.if_none_match.contains_weak(etag)
+        else:
+            fresh = (extra is None and request.if_modified_since is not None
+                     and modified < request.if_modified_since)
+        if fresh:
+            resp = APP.response_class(status=304)
+        else:
+            resp = APP.make_response(view(*args, **kwargs))
+            if resp.status_code != 200:
+                return resp
+        resp.set_etag(etag)
+        resp.last_modified = modified
+        resp.cache_control.no_cache = True
+        return resp
+    return wrapper
+
+def import_task(el) -> dict | None:
+    """Validated fields of one imported element; missing fields are filled in later."""
+    if not isinstance(el, dict):
+        return None
+    title = str(el.get("title") or "").strip()
+    if not title:
+        return None
+    task = {"title": title}
+    if el.get("category"):
+        task["category"] = str(el["category"]).strip() or "general"
+    if "done" in el:
+        task["done"] = bool(el["done"])
+    if el.get("created"):
+        task["created"] = el["created"]
+    if "due" in el:
+        try:
+            task["due"] = parse_due(el["due"])
+        except (TypeError, ValueError):
+            pass
+    if "priority" in el:
+        try:
+            task["priority"] = parse_priority(el["priority"])
+        except (TypeError, ValueError):
+            pass
+    if "tags" in el:
+        try:
+            task["tags"] = parse_tags(el["tags"])
+        except ValueError:
+            pass
+    if "parent" in el:
+        task["parent"] = str(el["parent"] or "").strip() or None
+    return task
 
-def find_index(tasks: list[dict], title: str) -> int:
-    tn = title.strip().lower()
+def check_parent(title: str, parent: str | None, parent_of=None, exists=None) -> str | None:
+    """
+    Why `parent` cannot be the parent of task `title` (None if it can). Run under
+    STORE.lock. Walks up the parent chain of `parent` through parent_of(key) and
+    exists(key), the store's by default (plan_batch passes its working copy).
+    A parent title nobody has ends the chain, but it still counts when it is
+    `title` itself: adding that task would close the loop.
+    """
+    if not parent:
+        return None
+    if parent_of is None:
+        STORE.tree.settle()
+        parent_of, exists = STORE.tree.parent_of.get, lambda k: STORE.get(k) is not None
+    key, pkey = norm_title(title), norm_title(parent)
+    if not exists(pkey):
+        return "parent not found"
+    depth, k, seen = 0, pkey, set()
+    while k and k not in seen:
+        if k == key:
+            return "a task cannot be its own ancestor"
+        if not exists(k):
+            break
+        seen.add(k)
+        depth += 1
+        k = parent_of(k)
+    if depth >= MAX_TASK_DEPTH:
+        return "subtasks nested too deep"
+    return None
+
+def complete_task(fields: dict, base: dict | None = None) -> dict:
+    # merge onto the existing task, or onto the defaults of a new one
+    task = dict(base) if base else {"title": "", "category": "general", "done": False, "created": now_iso()}
+    task.update(fields)
+    return task
+
+def _decoded_chunks(stream):
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    while True:
+        chunk = stream.read(IMPORT_CHUNK_SIZE)
+        if not chunk:
+            tail = decoder.decode(b"", final=True)
+            if tail:
+                yield tail
+            return
+        yield decoder.decode(chunk)
+
+def iter_json_array(stream):
+    """Yield the elements of a JSON array read from a binary stream, chunk by chunk."""
+    decoder, buf, pos, started = json.JSONDecoder(), "", 0, False
+    chunks = _decoded_chunks(stream)
+    eof = False
+    while True:
+        while pos < len(buf) and (buf[pos].isspace() or (started and buf[pos] == ",")):
+            pos += 1
+        if pos < len(buf):
+            if not started:
+                if buf[pos] != "[":
+                    raise ValueError("expected a JSON array")
+                started, pos = True, pos + 1
+                continue
+            if buf[pos] == "]":
+                return
+            try:
+                value, end = decoder.raw_decode(buf, pos)
+            except json.JSONDecodeError:
+                if eof:
+                    raise ValueError("truncated JSON array")
+            else:
+                yield value
+                pos = end
+                continue
+        if eof:
+            raise ValueError("truncated JSON array")
+        # need more input: keep only the unparsed tail
+        buf, pos = buf[pos:], 0
+        try:
+            buf += next(chunks)
+        except StopIteration:
+            eof = True
+
+def iter_ndjson(stream):
+    """Yield one JSON value per non-empty line."""
+    pending = ""
+    for chunk in _decoded_chunks(stream):
+        pending += chunk
+        *lines, pending = pending.split("\n")
+        for line in lines:
+            if line.strip():
+                yield json.loads(line)
+    if pending.strip():
+        yield json.loads(pending)
+
+def export_chunks(tasks: list[dict], fmt: str, compress: bool):
+    """Serialize tasks one by one, yielding ~EXPORT_CHUNK_SIZE byte chunks (optionally gzip-compressed)."""
+    gz = zlib.compressobj(6, zlib.DEFLATED, 31) if compress else None
+    buf, size = [], 0
+    def emit(text: str):
+        data = text.encode("utf-8")
+        return gz.compress(data) if gz else data
+    if fmt == "json":
+        buf.append("[\n")
     for i, t in enumerate(tasks):
-        if t.get("title","").strip().lower() == tn:
-            return i
-    return -1
-
-def merged_categories_from_tasks_and_file(tasks: list[dict]) -> list[str]:
-    # keep file categories, but also include any categories currently used by tasks
-    file_cats = load_categories()
-    seen = set(file_cats)
-    merged = file_cats.copy()
-    for t in tasks:
-        c = (t.get("category") or "").strip()
-        if c and c not in seen:
-            merged.append(c)
-            seen.add(c)
-    return merged
+        line = json.dumps(t, ensure_ascii=False, default=task_json)
+        if fmt == "json":
+            line = ("  " if i == 0 else ",\n  ") + line
+        else:
+            line += "\n"
+        buf.append(line); size += len(line)
+        if size >= EXPORT_CHUNK_SIZE:
+            chunk = emit("".join(buf)); buf, size = [], 0
+            if chunk:
+                yield chunk
+    if fmt == "json":
+        buf.append("\n]\n" if tasks else "]\n")
+    tail = emit("".join(buf)) + (gz.flush() if gz else b"")
+    if tail:
+        yield tail
+
+def task_etag(task: dict) -> str:
+    """Entity tag of one task (sent quoted): its version."""
+    return str(task.get("version", 1))
+
+def if_match_failed(task: dict) -> bool:
+    """
+    If-Match (RFC 9110) on a task, run under STORE.lock. It holds without the
+    header, for '*', or when one of the listed strong tags is the task's ETag
+    or the store's current ETag (the client's copy of the list is up to date).
+    Weak tags never match.
+    """
+    cond = request.if_match
+    if not cond or cond.star_tag:
+        return False
+    return not (cond.contains(task_etag(task)) or cond.contains(STORE.etag))
+
+def precondition_failed(task: dict):
+    resp = jsonify({"error":"precondition failed", "task": task})
+    resp.set_etag(task_etag(task))
+    return resp, 412
+
+def expected_version(payload: dict) -> int | None:
+    """The version a write is conditional on: the body's "version" (unless If-Match is sent)."""
+    if request.if_match:
+        return None
+    version = payload.get("version")
+    if version is None:
+        return None
+    if isinstance(version, bool):
+        raise ValueError("version must be an integer")
+    return int(version)
+
+@APP.errorhandler(VersionConflict)
+def on_version_conflict(e: VersionConflict):
+    # the client's copy is stale: hand back the current task so it can retry
+    with STORE.lock:
+        task = STORE.get(e.title)
+    return jsonify({"error":"version conflict", "task": task}), 412 if request.if_match else 409
+
+class BatchError(ValueError):
+    def __init__(self, index: int, message: str, status: int = 400) -> None:
+        super().__init__(message)
+        self.index, self.status = index, status
+
+def plan_batch(raw_ops: list) -> tuple[list[dict], list[str]]:
+    """
+    Validate batch operations against the store, taking the effect of earlier
+    operations of the same batch into account, and turn them into store
+    operations. Must run under STORE.lock. Returns (ops, categories used).
+    Parents are checked against the tree as the earlier operations leave it, so
+    no combination of edits can form a cycle. Like STORE.update / STORE.delete,
+    renaming a task carries the new title over to its subtasks and deleting one
+    moves its subtasks up to its own parent (extra edit operations).
+    """
+    present: dict[str, bool] = {}   # overlay: normalized title -> exists after earlier ops
+    names: dict[str, str] = {}      # overlay: normalized title -> title of added/renamed tasks
+    parents: dict[str, str | None] = {}   # overlay: key -> parent key after earlier ops
+    adopted: dict[str, set[str]] = {}     # overlay: parent key -> keys given that parent
+    def exists(title: str) -> bool:
+        key = norm_title(title)
+        return present[key] if key in present else STORE.get(title) is not None
+    def title_of(key: str) -> str:
+        return names[key] if key in names else STORE.get(key)["title"]
+    def parent_of(key: str) -> str | None:
+        return parents[key] if key in parents else STORE.tree.parent_of.get(key)
+    def set_parent(key: str, pkey: str | None) -> None:
+        if parents.get(key):
+            adopted[parents[key]].discard(key)
+        parents[key] = pkey
+        if pkey:
+            adopted.setdefault(pkey, set()).add(key)
+    def children(key: str) -> list[str]:
+        kids = [c for c in STORE.tree.children_of(key) if c not in parents] + sorted(adopted.get(key, ()))
+        return [c for c in kids if exists(c)]
+    STORE.tree.settle()
+    ops, cats = [], []
+    for i, raw in enumerate(raw_ops):
+        if not isinstance(raw, dict):
+            raise BatchError(i, "operation must be an object")
+        kind, title = raw.get("op"), str(raw.get("title") or "").strip()
+        if kind == "mark":
+            titles = raw.get("titles") if isinstance(raw.get("titles"), list) else [title]
+            titles = [str(t).strip() for t in titles if str(t).strip()]
+            if not titles:
+                raise BatchError(i, "title required")
+            missing = next((t for t in titles if not exists(t)), None)
+            if missing is not None:
+                raise BatchError(i, f"not found: {missing}", 404)
+            ops.append({"op": "mark", "titles": titles, "done": bool(raw.get("done", True)), "at": now_iso()})
+            continue
+        if not title:
+            raise BatchError(i, "title required")
+        if kind == "add":
+            if exists(title):
+                raise BatchError(i, "task already exists")
+            category = str(raw.get("category") or "general").strip()
+            cats.append(category)
+            task = {"title": title, "category": category, "done": bool(raw.get("done", False)),
+                    "created": raw.get("created") or now_iso()}
+            try:
+                if raw.get("due"):
+                    task["due"] = parse_due(raw["due"])
+                task["priority"] = parse_priority(raw.get("priority"))
+                if raw.get("tags"):
+                    task["tags"] = parse_tags(raw["tags"])
+            except (TypeError, ValueError) as e:
+                raise BatchError(i, str(e))
+            if str(raw.get("parent") or "").strip():
+                task["parent"] = str(raw["parent"]).strip()
+                error = check_parent(title, task["parent"], parent_of, exists)
+                if error:
+                    raise BatchError(i, error, 404 if error == "parent not found" else 400)
+                task["parent"] = title_of(norm_title(task["parent"]))
+            ops.append({"op": "add", "task": task})
+            present[norm_title(title)] = True
+            names[norm_title(title)] = title
+            set_parent(norm_title(title), norm_title(task.get("parent") or "") or None)
+        elif kind == "edit":
+            if not exists(title):
+                raise BatchError(i, "not found", 404)
+            raw_changes = raw.get("changes") if isinstance(raw.get("changes"), dict) else {}
+            changes = {}
+            if str(raw_changes.get("title") or "").strip():
+                changes["title"] = str(raw_changes["title"]).strip()
+                if norm_title(changes["title"]) != norm_title(title) and exists(changes["title"]):
+                    raise BatchError(i, "duplicate title")
+            if str(raw_changes.get("category") or "").strip():
+                changes["category"] = str(raw_changes["category"]).strip()
+                cats.append(changes["category"])
+            if "done" in raw_changes:
+                changes["done"] = bool(raw_changes["done"])
+                if not changes["done"]:
+                    changes["completed"] = None
+                elif not (STORE.get(title) or {}).get("done"):
+                    changes["completed"] = now_iso()
+            try:
+                if "due" in raw_changes:
+                    changes["due"] = parse_due(raw_changes["due"])
+                if "priority" in raw_changes:
+                    changes["priority"] = parse_priority(raw_changes["priority"])
+                if "tags" in raw_changes:
+                    changes["tags"] = parse_tags(raw_changes["tags"])
+            except (TypeError, ValueError) as e:
+                raise BatchError(i, str(e))
+            if "parent" in raw_changes:
+                changes["parent"] = str(raw_changes["parent"] or "").strip() or None
+                error = check_parent(title, changes["parent"], parent_of, exists)
+                if error:
+                    raise BatchError(i, error, 404 if error == "parent not found" else 400)
+                if changes["parent"]:
+                    changes["parent"] = title_of(norm_title(changes["parent"]))
+                set_parent(norm_title(title), norm_title(changes["parent"] or "") or None)
+            ops.append({"op": "edit", "title": title, "changes": changes})
+            key, new_key = norm_title(title), norm_title(changes.get("title", title))
+            if new_key != key:
+                kids = children(key)
+                set_parent(new_key, parent_of(key))
+                present[key] = False
+                present[new_key], names[new_key] = True, changes["title"]
+                for c in kids:
+                    ops.append({"op": "edit", "title": title_of(c), "changes": {"parent": changes["title"]}})
+                    set_parent(c, new_key)
+            elif "title" in changes:
+                names[key] = changes["title"]
+        elif kind == "delete":
+            if not exists(title):
+                raise BatchError(i, "not found", 404)
+            key = norm_title(title)
+            up = parent_of(key)
+            up = up if up and exists(up) else None
+            for c in children(key):
+                ops.append({"op": "edit", "title": title_of(c), "changes": {"parent": title_of(up) if up else None}})
+                set_parent(c, up)
+            ops.append({"op": "delete", "title": title})
+            present[key] = False
+        else:
+            raise BatchError(i, "op must be add, edit, mark or delete")
+    return ops, cats
+
+def parse_version(token: str) -> int | None:
+    """Accept a bare version or an ETag-style '<epoch>-<version>' token from this store."""
+    token = (token or "").strip().strip('"')
+    epoch, _, version = token.rpartition("-")
+    if epoch and epoch != STORE.epoch:
+        return None
+    return int(version)
 
 # --- API ---
 @APP.get("/api/tasks")
+@conditional
 def api_get_tasks():
-    return jsonify(load_tasks())
+    """
+    Without paging parameters the full list is returned (unchanged behaviour).
+    With ?limit= (and optionally category, done, q, sort, cursor) one page is
+    returned as {items, next_cursor, total, done_total}.
+    """
+    args = request.args
+    if "limit" not in args and "cursor" not in args:
+        return jsonify(STORE.all())
+    sort = args.get("sort", "created")
+    if sort.lstrip("-") not in TASK_SORT_KEYS:
+        return jsonify({"error":f"sort must be one of {', '.join(TASK_SORT_KEYS)}"}), 400
+    try:
+        limit = max(1, min(int(args.get("limit", 50)), MAX_PAGE_SIZE))
+        with STORE.lock:
+            page = query_tasks(STORE, category=args.get("category", "").strip(), done=parse_bool(args.get("done")),
+                               q=args.get("q", ""), sort=sort, limit=limit, cursor=args.get("cursor", ""))
+            page["done_total"] = STORE.categories.done_total
+    except (ValueError, TypeError):
+        return jsonify({"error":"invalid limit or cursor"}), 400
+    return jsonify(page)
+
+@APP.get("/api/tasks/changes")
+def api_task_changes():
+    """
+    Delta sync: ?since=<version> (as returned in 'version' or the ETag) lists the
+    tasks created/modified since then and the titles deleted since then.
+    'reset': true means the client is too far behind and must reload everything.
+    """
+    try:
+        since = parse_version(request.args.get("since", ""))
+    except ValueError:
+        return jsonify({"error":"since must be a version"}), 400
+    with STORE.lock:
+        delta = STORE.changes_since(since) if since is not None else None
+        version = STORE.etag
+        done_total = STORE.categories.done_total
+    if delta is None:
+        return jsonify({"version": version, "reset": True, "changed": [], "deleted": []})
+    return jsonify({"version": version, "reset": False, **delta, "done_total": done_total})
+
+@APP.get("/api/tasks/search")
+@conditional
+def api_search_tasks():
+    """
+    ?q=<text>&limit=20&mode=auto|prefix|fuzzy. Prefix matches (on the title or one
+    of its words) come first; in auto mode fuzzy trigram matches fill the rest.
+    Returns {items: [{task, match, score}]}.
+    """
+    q = norm_title(request.args.get("q", ""))
+    mode = request.args.get("mode", "auto")
+    if mode not in ("auto", "prefix", "fuzzy"):
+        return jsonify({"error":"mode must be auto, prefix or fuzzy"}), 400
+    try:
+        limit = max(1, min(int(request.args.get("limit", 20)), MAX_PAGE_SIZE))
+    except ValueError:
+        return jsonify({"error":"invalid limit"}), 400
+    items = []
+    if q:
+        with STORE.lock:
+            seen = set()
+            if mode != "fuzzy":
+                for tid in STORE.search.prefix(q, limit):
+                    seen.add(tid)
+                    items.append({"task": STORE.by_id(tid), "match": "prefix", "score": 1.0})
+            if mode != "prefix" and len(items) < limit:
+                for tid, score in STORE.search.fuzzy(q, limit + len(seen)):
+                    if tid not in seen and len(items) < limit:
+                        items.append({"task": STORE.by_id(tid), "match": "fuzzy", "score": score})
+    return jsonify({"query": q, "items": items})
+
+@APP.get("/api/tasks/due")
+@conditional
+def api_due_tasks():
+    """
+    Tasks with a due date in [after, before), earliest first, read from the due
+    index. ?after=&before= are ISO dates or date-times (both optional);
+    ?done=0|1 filters on status; ?limit= caps the result (default MAX_PAGE_SIZE).
+    """
+    try:
+        after = parse_due(request.args.get("after"))
+        before = parse_due(request.args.get("before"))
+    except ValueError:
+        return jsonify({"error":"invalid date"}), 400
+    try:
+        limit = max(1, min(int(request.args.get("limit", MAX_PAGE_SIZE)), MAX_PAGE_SIZE))
+    except ValueError:
+        return jsonify({"error":"invalid limit"}), 400
+    done = parse_bool(request.args.get("done"))
+    items = []
+    with STORE.lock:
+        for tid in STORE.due.between(after, before):
+            task = STORE.by_id(tid)
+            if done is None or bool(task.get("done")) == done:
+                items.append(task)
+                if len(items) >= limit:
+                    break
+    return jsonify(items)
+
+@APP.get("/api/tasks/next")
+@conditional
+def api_next_tasks():
+    """Top ?k= (default 5) open tasks by priority, then due date, then creation."""
+    try:
+        k = max(1, min(int(request.args.get("k", 5)), MAX_PAGE_SIZE))
+    except ValueError:
+        return jsonify({"error":"invalid k"}), 400
+    with STORE.lock:
+        return jsonify({"items": [STORE.by_id(tid) for tid in STORE.next_up.top(k)], "open": len(STORE.next_up)})
+
+@APP.get("/api/tasks/tagged")
+@conditional
+def api_tagged_tasks():
+    """
+    ?tags=work,urgent,-someday: tasks with every listed tag and none of the tags
+    prefixed with '-'; ?done=0|1 filters on status. Resolved as bitmap
+    intersections on the tag index. Paged by id: ?limit= and ?cursor=<next_cursor>.
+    Returns {items, total, next_cursor}.
+    """
+    try:
+        tags = parse_tags(request.args.get("tags", ""))
+        limit = max(1, min(int(request.args.get("limit", 50)), MAX_PAGE_SIZE))
+        after = int(request.args.get("cursor") or -1)
+    except ValueError:
+        return jsonify({"error":"invalid query"}), 400
+    all_of = [t for t in tags if not t.startswith("-")]
+    none_of = [t[1:] for t in tags if t.startswith("-") and len(t) > 1]
+    with STORE.lock:
+        bits = STORE.tags.query(all_of, none_of, parse_bool(request.args.get("done")))
+        ids = STORE.tags.ids(bits, after, limit + 1)
+        items = [STORE.by_id(tid) for tid in ids[:limit]]
+        total = bits.bit_count()
+    return jsonify({"items": items, "total": total, "next_cursor": str(ids[limit - 1]) if len(ids) > limit else None})
+
+@APP.get("/api/tags")
+@conditional
+def api_get_tags():
+    """Tags in use with their task counts, most used first."""
+    with STORE.lock:
+        counts = sorted(STORE.tags.counts.items(), key=lambda kv: (-kv[1], kv[0]))
+    return jsonify([{"name": name, "count": n} for name, n in counts])
+
+@APP.get("/api/tasks/<string:title>/subtree")
+@conditional
+def api_task_subtree(title: str):
+    """A task, its rolled-up progress and all its subtasks (depth-first, with depth)."""
+    with STORE.lock:
+        task = STORE.get(title)
+        if task is None:
+            return jsonify({"error":"not found"}), 404
+        key = norm_title(title)
+        items = [{"task": STORE.get(k), "depth": depth} for k, depth in STORE.tree.subtree(key)[1:]]
+        return jsonify({"task": task, "progress": STORE.tree.progress(key), "items": items})
+
+@APP.get("/api/projects")
+@conditional
+def api_projects():
+    """Top-level tasks that have subtasks, with their rolled-up progress."""
+    with STORE.lock:
+        return jsonify([{"title": STORE.get(k)["title"], **STORE.tree.progress(k)} for k in STORE.tree.projects()])
+
+@APP.get("/api/events")
+def api_events():
+    """Server-Sent Events stream of task/category changes; resumes from Last-Event-ID."""
+    q = EVENTS.subscribe(request.headers.get("Last-Event-ID") or request.args.get("last_event_id"))
+    resp = APP.response_class(EVENTS.stream(q), mimetype="text/event-stream")
+    resp.headers["Cache-Control"] = "no-cache"
+    resp.headers["X-Accel-Buffering"] = "no"
+    return resp
+
+@APP.post("/api/tasks/batch")
+def api_batch():
+    """
+    Apply a list of operations atomically with a single persist.
+    Body: {"ops": [...]} or a bare list. Supported operations:
+      {"op": "add", "title", "category"?, "done"?, "created"?, "due"?, "priority"?, "tags"?, "parent"?}
+      {"op": "edit", "title", "changes": {"title"?, "category"?, "done"?, "due"?, "priority"?, "tags"?, "parent"?}}
+      {"op": "mark", "title" | "titles", "done"?}
+      {"op": "delete", "title"}
+    The whole batch is validated first; on error nothing is applied and the
+    response names the index of the failing operation. Renaming or deleting a
+    parent updates its subtasks, as the single-task endpoints do.
+    """
+    payload = request.get_json(silent=True)
+    raw_ops = payload.get("ops") if isinstance(payload, dict) else payload
+    if not isinstance(raw_ops, list):
+        return jsonify({"error":"ops must be a list"}), 400
+    if len(raw_ops) > MAX_BATCH_OPS:
+        return jsonify({"error":f"at most {MAX_BATCH_OPS} operations per batch"}), 400
+    with STORE.lock:
+        try:
+            ops, cats = plan_batch(raw_ops)
+        except BatchError as e:
+            return jsonify({"error": str(e), "index": e.index}), e.status
+        ensure_categories_exist(cats)
+        STORE.batch(ops)
+        version = STORE.etag
+    return jsonify({"ok": True, "applied": len(raw_ops), "version": version})
 
 @APP.post("/api/tasks")
 def api_add_task():
@@ -121,113 +2837,564 @@ def api_add_task():
     category = (payload.get("category") or "general").strip()
     if not title:
         return jsonify({"error":"title required"}), 400
-    tasks = load_tasks()
-    if find_index(tasks, title) != -1:
-        return jsonify({"error":"task already exists"}), 400
-    # ensure category present in categories list (persist)
-    ensure_category_exists(category)
-    tasks.append({"title": title, "category": category, "done": False, "created": now_iso()})
-    save_tasks(tasks)
-    return jsonify({"ok": True}), 201
+    try:
+        due = parse_due(payload.get("due"))
+    except (TypeError, ValueError):
+        return jsonify({"error":"invalid due date"}), 400
+    try:
+        priority = parse_priority(payload.get("priority"))
+        tags = parse_tags(payload.get("tags"))
+    except (TypeError, ValueError) as e:
+        return jsonify({"error": str(e)}), 400
+    parent = str(payload.get("parent") or "").strip()
+    with STORE.lock:
+        if STORE.get(title) is not None:
+            return jsonify({"error":"task already exists"}), 400
+        # a new category is registered by STORE.add, only once the task is accepted
+        task = {"title": title, "category": category, "done": False, "created": now_iso(), "priority": priority}
+        if due:
+            task["due"] = due
+        if tags:
+            task["tags"] = tags
+        if parent:
+            error = check_parent(title, parent)
+            if error:
+                return jsonify({"error": error}), 404 if error == "parent not found" else 400
+            task["parent"] = STORE.get(parent)["title"]
+        STORE.add(task)
+    return jsonify({"ok": True, "version": task["version"]}), 201
+
+@APP.get("/api/tasks/<string:title>")
+def api_get_task(title: str):
+    """One task, with its ETag (the tag to send back in If-Match)."""
+    with STORE.lock:
+        task = STORE.get(title)
+        if task is None:
+            return jsonify({"error":"not found"}), 404
+        resp = jsonify(task)
+        resp.set_etag(task_etag(task))
+    return resp.make_conditional(request)
 
 @APP.put("/api/tasks/<string:title>")
 def api_edit_task(title: str):
+    """
+    Edit fields of a task. To edit only the version you have, send If-Match with
+    the task's ETag (or the list ETag you read it with; 412 if it changed since),
+    or "version" in the body (409 on conflict).
+    """
     payload = request.get_json(silent=True) or {}
     new_title = payload.get("title","").strip()
     new_category = payload.get("category","").strip()
-    tasks = load_tasks()
-    idx = find_index(tasks, title)
-    if idx == -1:
-        return jsonify({"error":"not found"}), 404
-    if new_title:
-        other = find_index(tasks, new_title)
-        if other != -1 and other != idx:
+    try:
+        expected = expected_version(payload)
+    except (TypeError, ValueError):
+        return jsonify({"error":"invalid version"}), 400
+    with STORE.lock:
+        task = STORE.get(title)
+        if task is None:
+            return jsonify({"error":"not found"}), 404
+        if if_match_failed(task):
+            return precondition_failed(task)
+        changes = {}
+        if new_title:
+            changes["title"] = new_title
+        if new_category:
+            # registered by the store once the edit is applied
+            changes["category"] = new_category
+        if "due" in payload:
+            # null or "" removes the due date
+            try:
+                changes["due"] = parse_due(payload["due"])
+            except (TypeError, ValueError):
+                return jsonify({"error":"invalid due date"}), 400
+        try:
+            if "priority" in payload:
+                changes["priority"] = parse_priority(payload["priority"])
+            if "tags" in payload:
+                changes["tags"] = parse_tags(payload["tags"])
+        except (TypeError, ValueError) as e:
+            return jsonify({"error": str(e)}), 400
+        if "parent" in payload:
+            # null or "" makes it a top-level task
+            parent = str(payload["parent"] or "").strip()
+            error = check_parent(title, parent)
+            if error:
+                return jsonify({"error": error}), 404 if error == "parent not found" else 400
+            changes["parent"] = STORE.get(parent)["title"] if parent else None
+        try:
+            task = STORE.update(title, changes, expected)
+        except ValueError:
             return jsonify({"error":"duplicate title"}), 400
-        tasks[idx]["title"] = new_title
-    if new_category:
-        tasks[idx]["category"] = new_category
-        ensure_category_exists(new_category)
-    save_tasks(tasks)
-    return jsonify({"ok": True})
+        resp = jsonify({"ok": True, "version": task["version"]})
+        resp.set_etag(task_etag(task))
+    return resp
 
 @APP.post("/api/tasks/mark")
 def api_mark_done():
     """
-    Toggle endpoint. Accepts JSON: { "title": "...", "done": true|false }.
-    If 'done' omitted, defaults to True (mark done).
+    Toggle endpoint. Accepts JSON: { "title": "...", "done": true|false, "version"? }.
+    If 'done' omitted, defaults to True (mark done). With a version (409) or
+    If-Match (412) the task is only changed if it is still at that version.
     """
     payload = request.get_json(silent=True) or {}
     title = (payload.get("title") or "").strip()
     done_flag = payload.get("done", True)
     if not title:
         return jsonify({"error":"title required"}), 400
-    tasks = load_tasks(); idx = find_index(tasks, title)
-    if idx == -1:
-        return jsonify({"error":"not found"}), 404
-    tasks[idx]["done"] = bool(done_flag)
-    save_tasks(tasks)
-    return jsonify({"ok": True, "title": tasks[idx]["title"], "done": tasks[idx]["done"]})
+    try:
+        expected = expected_version(payload)
+    except (TypeError, ValueError):
+        return jsonify({"error":"invalid version"}), 400
+    with STORE.lock:
+        task = STORE.get(title)
+        if task is None:
+            return jsonify({"error":"not found"}), 404
+        if if_match_failed(task):
+            return precondition_failed(task)
+        STORE.mark([title], bool(done_flag), None if expected is None else {title: expected})
+        task = STORE.get(title)
+        resp = jsonify({"ok": True, "title": task["title"], "done": task["done"], "version": task["version"]})
+        resp.set_etag(task_etag(task))
+    return resp
 
 @APP.post("/api/tasks/mark-bulk")
 def api_mark_bulk():
+    """JSON: {"titles": [...], "done"?, "versions"?: {title: version}} (all or nothing on conflict)."""
     payload = request.get_json(silent=True) or {}
     titles = payload.get("titles") or []
     done_flag = payload.get("done", True)
     if not isinstance(titles, list):
         return jsonify({"error":"titles must be list"}), 400
-    tasks = load_tasks(); changed = 0
-    for title in titles:
-        idx = find_index(tasks, title)
-        if idx != -1 and tasks[idx].get("done", False) != bool(done_flag):
-            tasks[idx]["done"] = bool(done_flag); changed += 1
-    if changed: save_tasks(tasks)
+    versions = payload.get("versions")
+    if versions is not None and not (isinstance(versions, dict) and all(type(v) is int for v in versions.values())):
+        return jsonify({"error":"versions must map titles to integers"}), 400
+    changed = STORE.mark(titles, bool(done_flag), versions)
     return jsonify({"ok": True, "changed": changed})
 
 @APP.delete("/api/tasks/<string:title>")
 def api_delete_task(title: str):
-    tasks = load_tasks()
-    new = [t for t in tasks if t.get("title","").strip().lower() != title.strip().lower()]
-    if len(new) == len(tasks):
-        return jsonify({"error":"not found"}), 404
-    save_tasks(new)
+    try:
+        expected = expected_version(request.get_json(silent=True) or {})
+    except (TypeError, ValueError):
+        return jsonify({"error":"invalid version"}), 400
+    with STORE.lock:
+        task = STORE.get(title)
+        if task is None:
+            return jsonify({"error":"not found"}), 404
+        if if_match_failed(task):
+            return precondition_failed(task)
+        STORE.delete(title, expected)
     return jsonify({"ok": True})
 
 @APP.post("/api/import")
 def api_import():
-    payload = request.get_json(silent=True)
-    if not isinstance(payload, list):
+    """
+    Body: a JSON array of tasks, or NDJSON (Content-Type application/x-ndjson or
+    ?format=ndjson). The body is parsed incrementally; duplicate titles (first one
+    wins) and entries without a title are skipped. Tasks and new categories are
+    each persisted once. ?mode=replace (default) or ?mode=merge (upsert by title).
+    """
+    mode = request.args.get("mode", "replace")
+    if mode not in ("replace", "merge"):
+        return jsonify({"error":"mode must be replace or merge"}), 400
+    ndjson = request.mimetype == "application/x-ndjson" or request.args.get("format") == "ndjson"
+    tasks, seen, cats, skipped = [], set(), set(), 0
+    try:
+        for el in (iter_ndjson if ndjson else iter_json_array)(request.stream):
+            task = import_task(el)
+            if task is None or norm_title(task["title"]) in seen:
+                skipped += 1
+                continue
+            seen.add(norm_title(task["title"]))
+            cats.add(task.get("category", "general"))
+            tasks.append(task)
+    except ValueError:
         return jsonify({"error":"payload must be a list"}), 400
-    tasks = []
-    for el in payload:
-        if not isinstance(el, dict) or "title" not in el: continue
-        title = str(el.get("title","")).strip()
-        category = str(el.get("category","general")).strip()
-        done = bool(el.get("done", False))
-        created = el.get("created") or now_iso()
-        tasks.append({"title": title, "category": category, "done": done, "created": created})
+    with STORE.lock:
         # ensure categories for imported tasks
-        ensure_category_exists(category)
-    save_tasks(tasks)
-    return jsonify({"ok": True, "imported": len(tasks)})
+        ensure_categories_exist(sorted(cats))
+        if mode == "merge":
+            STORE.merge([complete_task(t, STORE.get(t["title"])) for t in tasks])
+        else:
+            STORE.replace([complete_task(t) for t in tasks])
+    return jsonify({"ok": True, "imported": len(tasks), "skipped": skipped, "mode": mode})
 
 @APP.get("/api/export")
+@conditional
 def api_export():
-    tasks = load_tasks()
-    buf = io.BytesIO(json.dumps(tasks, ensure_ascii=False, indent=2).encode("utf-8"))
-    return send_file(buf, mimetype="application/json", as_attachment=True, download_name="tasks-export.json")
+    """
+    Streamed export. ?format=json (array, default) or ndjson (one task per line);
+    ?gzip=1 compresses the stream (Content-Encoding: gzip); ?since=<version> only
+    exports tasks changed after that version, deletions as {"title", "deleted": true}.
+    If the version is too old to be served incrementally everything is exported
+    and X-Export-Reset is set.
+    """
+    fmt = request.args.get("format", "json").lower()
+    if fmt not in ("json", "ndjson"):
+        return jsonify({"error":"format must be json or ndjson"}), 400
+    compress = parse_bool(request.args.get("gzip")) or False
+    reset = False
+    if request.args.get("since"):
+        try:
+            since = parse_version(request.args["since"])
+        except ValueError:
+            return jsonify({"error":"since must be a version"}), 400
+        delta = STORE.changes_since(since) if since is not None else None
+        if delta is None:
+            reset, tasks = True, STORE.all()
+        else:
+            tasks = delta["changed"] + [{"title": t, "deleted": True} for t in delta["deleted"]]
+    else:
+        tasks = STORE.all()
+    name = "tasks-export." + ("ndjson" if fmt == "ndjson" else "json")
+    resp = APP.response_class(stream_with_context(export_chunks(tasks, fmt, compress)),
+                              mimetype="application/x-ndjson" if fmt == "ndjson" else "application/json")
+    resp.headers["Content-Disposition"] = f"attachment; filename={name}"
+    if compress:
+        resp.headers["Content-Encoding"] = "gzip"
+        resp.vary.add("Accept-Encoding")
+    if reset:
+        resp.headers["X-Export-Reset"] = "1"
+    return resp
 
 @APP.post("/api/clear")
 def api_clear_all():
-    save_tasks([])
+    STORE.replace([])
     return jsonify({"ok": True})
 
+@APP.get("/api/backups")
+def api_list_backups():
+    return jsonify(list(reversed(list_backups())))
+
+@APP.post("/api/backups")
+def api_create_backup():
+    entry = STORE.backup()
+    return jsonify({"ok": True, "backup": entry, "unchanged": entry is None}), 201 if entry else 200
+
+@APP.post("/api/backups/<string:backup_id>/restore")
+def api_restore_backup(backup_id: str):
+    tasks = load_backup(backup_id)
+    if tasks is None:
+        return jsonify({"error":"not found"}), 404
+    # keep the state being replaced restorable as well
+    STORE.backup()
+    STORE.replace(tasks)
+    return jsonify({"ok": True, "restored": len(tasks)})
+
+@APP.get("/api/archive")
+def api_list_archive():
+    """Archived tasks, oldest first: ?limit=50&cursor=<next_cursor>&q=<title text>."""
+    try:
+        limit = max(1, min(int(request.args.get("limit", 50)), MAX_PAGE_SIZE))
+        after = int(request.args.get("cursor") or 0)
+    except ValueError:
+        return jsonify({"error":"invalid query"}), 400
+    items, next_cursor = list_archive(after, limit, request.args.get("q", ""))
+    return jsonify({"items": items, "next_cursor": None if next_cursor is None else str(next_cursor)})
+
+@APP.post("/api/archive")
+def api_run_archive():
+    """Archive now. JSON (optional): {"days": N} overrides TODO_ARCHIVE_DAYS."""
+    payload = request.get_json(silent=True) or {}
+    try:
+        days = int(payload.get("days", ARCHIVE_AFTER_DAYS))
+    except (TypeError, ValueError):
+        return jsonify({"error":"days must be an integer"}), 400
+    if days < 0:
+        return jsonify({"error":"days must be >= 0"}), 400
+    return jsonify({"ok": True, "archived": archive_done_tasks(days)})
+
+@APP.post("/api/archive/<int:archive_id>/restore")
+def api_restore_archived(archive_id: int):
+    # archive lock first, then the store: same order as archive_done_tasks
+    with ARCHIVE_LOCK, STORE.lock:
+        rec = read_archived(archive_id)
+        if rec is None:
+            return jsonify({"error":"not found"}), 404
+        task = rec["task"]
+        if STORE.get(task.get("title", "")) is not None:
+            return jsonify({"error":"task already exists"}), 400
+        if task.get("parent") and STORE.get(task["parent"]) is None:
+            task["parent"] = None
+        if task.get("done"):
+            # restart the archiving clock, or the next run would move it straight back
+            task["completed"] = now_iso()
+        ensure_category_exists(task.get("category") or "general")
+        STORE.add(task)
+        mark_restored(archive_id)
+    return jsonify({"ok": True, "task": task})
+
 @APP.get("/api/categories")
+# names can be registered without a store commit (e.g. by a batch that then conflicts)
+@conditional(extra=lambda: STORE.categories.revision)
 def api_get_categories():
-    # merge categories from file + tasks to avoid losing any used category
-    tasks = load_tasks()
-    cats = merged_categories_from_tasks_and_file(tasks)
+    """
+    Known categories (file + any used by tasks), maintained incrementally by the
+    registry. ?with_counts=1 returns [{name, count, done}] instead of names.
+    """
+    with STORE.lock:
+        cats = STORE.categories.listing(with_counts=bool(parse_bool(request.args.get("with_counts"))))
     return jsonify(cats)
 
+# --- Habits ---
+class Habit:
+    """
+    A recurring habit. Completions are one bit per day since `start` (bit i set =
+    done on start + i days), kept as a Python int and persisted as hex.
+    `schedule` is {"type": "daily"}, {"type": "weekly", "days": [0..6]} (Mon=0)
+    or {"type": "interval", "every": n}; streaks count consecutive scheduled days.
+    completions / streak / longest are updated in O(1) when a day is checked at
+    the tip of the log; only back-filling or unchecking rescans the bitset.
+    They are saved with the habit, so loading one does not rescan it either.
+    """
+    DERIVED = ("completions", "streak", "longest")
+
+    def __init__(self, name: str, schedule: dict, start: date, log: int = 0, derived: dict | None = None) -> None:
+        self.name, self.schedule, self.start, self.log = name, schedule, start, log
+        kind = schedule.get("type")
+        self.every = max(1, int(schedule.get("every", 1))) if kind == "interval" else 1
+        self.days = frozenset(int(d) % 7 for d in schedule.get("days", [])) if kind == "weekly" else None
+        if self.days is not None and not self.days:
+            raise ValueError("weekly schedule needs at least one day")
+        self.completions = self.streak = self.longest = 0
+        self.last_done = -1
+        if derived is not None:
+            self.completions, self.streak, self.longest = (int(derived[k]) for k in self.DERIVED)
+            self.last_done = log.bit_length() - 1
+        else:
+            self.recompute()
+
+    # schedule arithmetic, all O(1)
+    def is_scheduled(self, day: int) -> bool:
+        if day < 0:
+            return False
+        if self.days is not None:
+            return (self.start.weekday() + day) % 7 in self.days
+        return day % self.every == 0
+
+    def prev_scheduled(self, day: int) -> int:
+        """Latest scheduled day strictly before `day`, or -1."""
+        if self.days is not None:
+            for d in range(day - 1, max(day - 8, -1), -1):
+                if self.is_scheduled(d):
+                    return d
+            return -1
+        d = (day - 1) - (day - 1) % self.every
+        return d if d >= 0 else -1
+
+    def scheduled_count(self, day: int) -> int:
+        """Number of scheduled days in [0, day]."""
+        if day < 0:
+            return 0
+        if self.days is not None:
+            weeks, rest = divmod(day + 1, 7)
+            return weeks * len(self.days) + sum(1 for d in range(day + 1 - rest, day + 1) if self.is_scheduled(d))
+        return day // self.every + 1
+
+    def recompute(self) -> None:
+        self.completions = bin(self.log).count("1")
+        self.streak = self.longest = 0
+        self.last_done = self.log.bit_length() - 1
+        for day in range(self.last_done + 1):
+            if not self.is_scheduled(day):
+                continue
+            if self.log >> day & 1:
+                self.streak += 1
+                self.longest = max(self.longest, self.streak)
+            else:
+                self.streak = 0
+
+    def set_done(self, day: int, done: bool = True) -> bool:
+        """Mark one scheduled day done/undone; returns False if nothing changed."""
+        if bool(self.log >> day & 1) == done:
+            return False
+        if done:
+            self.log |= 1 << day
+            if day > self.last_done:
+                # common case: checking off the newest day extends (or restarts) the streak
+                self.streak = self.streak + 1 if self.last_done >= 0 and self.prev_scheduled(day) == self.last_done else 1
+                self.longest = max(self.longest, self.streak)
+                self.last_done = day
+                self.completions += 1
+                return True
+        else:
+            self.log &= ~(1 << day)
+        self.recompute()
+        return True
+
+    def day_index(self, d: date) -> int:
+        return (d - self.start).days
+
+    def stats(self, today: date) -> dict:
+        t = self.day_index(today)
+        # the streak is still alive if the last due day before today was done (today may be pending)
+        alive = self.last_done >= 0 and self.last_done >= self.prev_scheduled(t)
+        due = self.scheduled_count(t)
+        return {"name": self.name, "schedule": self.schedule, "start": self.start.isoformat(),
+                "current_streak": self.streak if alive else 0, "longest_streak": self.longest,
+                "completions": self.completions, "rate": round(self.completions / due, 3) if due else 0.0,
+                "due_today": self.is_scheduled(t), "done_today": t >= 0 and bool(self.log >> t & 1)}
+
+    def history(self, first: int, last: int) -> list[str]:
+        """ISO dates of completions with day index in [first, last], via the set bits only."""
+        bits = (self.log >> max(first, 0)) << max(first, 0)
+        bits &= (1 << (last + 1)) - 1 if last >= 0 else 0
+        out = []
+        while bits:
+            low = bits & -bits
+            out.append((self.start + timedelta(days=low.bit_length() - 1)).isoformat())
+            bits ^= low
+        return out
+
+    def to_dict(self) -> dict:
+        return {"name": self.name, "schedule": self.schedule, "start": self.start.isoformat(), "log": format(self.log, "x"),
+                "completions": self.completions, "streak": self.streak, "longest": self.longest}
+
+    @classmethod
+    def from_dict(cls, d: dict) -> Habit:
+        # files written before the derived fields were saved are recomputed once
+        derived = d if all(k in d for k in cls.DERIVED) else None
+        return cls(d["name"], d.get("schedule") or {"type": "daily"}, date.fromisoformat(d["start"]),
+                   int(d.get("log") or "0", 16), derived)
+
+class HabitStore:
+    """
+    Habits keyed by normalized name, persisted to habits.json (write-then-rename).
+    Use `with HABITS:` around every access: it takes a lock shared with the other
+    worker processes and reloads the file if another worker saved it since.
+    """
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self.lock = ProcessLock(path.with_suffix(".lock"))
+        self.habits: dict[str, Habit] = {}
+        self._stamp = None
+
+    def __enter__(self) -> "HabitStore":
+        self.lock.__enter__()
+        try:
+            if self._file_stamp() != self._stamp:
+                self.load()
+        except BaseException:
+            self.lock.__exit__(None, None, None)
+            raise
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.lock.__exit__(*exc)
+
+    def _file_stamp(self):
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return None
+        # every save is a new file (rename), so the inode changes even within one mtime tick
+        return (st.st_ino, st.st_mtime_ns, st.st_ctime_ns, st.st_size)
+
+    def load(self) -> None:
+        self._stamp = self._file_stamp()
+        try:
+            raw = json.loads(self.path.read_text(encoding="utf-8"))
+        except Exception:
+            raw = []
+        habits = {}
+        for d in raw if isinstance(raw, list) else []:
+            try:
+                habit = Habit.from_dict(d)
+            except (KeyError, TypeError, ValueError):
+                continue
+            habits[norm_title(habit.name)] = habit
+        self.habits = habits
+
+    def save(self) -> None:
+        tmp = self.path.with_suffix(".json.tmp")
+        tmp.write_text(json.dumps([h.to_dict() for h in self.habits.values()], ensure_ascii=False), encoding="utf-8")
+        os.replace(tmp, self.path)
+        self._stamp = self._file_stamp()
+
+    def get(self, name: str) -> Habit | None:
+        return self.habits.get(norm_title(name))
+
+HABITS = HabitStore(HABITS_FILE)
+
+def parse_schedule(raw) -> dict:
+    if raw in (None, "", "daily"):
+        return {"type": "daily"}
+    if isinstance(raw, dict):
+        kind = raw.get("type")
+        if kind == "daily":
+            return {"type": "daily"}
+        if kind == "weekly" and isinstance(raw.get("days"), list):
+            return {"type": "weekly", "days": sorted({int(d) % 7 for d in raw["days"]})}
+        if kind == "interval":
+            return {"type": "interval", "every": max(1, int(raw.get("every", 1)))}
+    raise ValueError("schedule must be daily, {type: weekly, days: [...]} or {type: interval, every: n}")
+
+@APP.get("/api/habits")
+def api_get_habits():
+    today = date.today()
+    with HABITS:
+        return jsonify([h.stats(today) for h in HABITS.habits.values()])
+
+@APP.post("/api/habits")
+def api_add_habit():
+    payload = request.get_json(silent=True) or {}
+    name = (payload.get("name") or "").strip()
+    if not name:
+        return jsonify({"error":"name required"}), 400
+    try:
+        schedule = parse_schedule(payload.get("schedule"))
+        start = date.fromisoformat(payload["start"]) if payload.get("start") else date.today()
+        habit = Habit(name, schedule, start)
+    except (TypeError, ValueError) as e:
+        return jsonify({"error": str(e)}), 400
+    with HABITS:
+        if HABITS.get(name) is not None:
+            return jsonify({"error":"habit already exists"}), 400
+        HABITS.habits[norm_title(name)] = habit
+        HABITS.save()
+    return jsonify(habit.stats(date.today())), 201
+
+@APP.delete("/api/habits/<string:name>")
+def api_delete_habit(name: str):
+    with HABITS:
+        if HABITS.habits.pop(norm_title(name), None) is None:
+            return jsonify({"error":"not found"}), 404
+        HABITS.save()
+    return jsonify({"ok": True})
+
+@APP.post("/api/habits/<string:name>/check")
+def api_check_habit(name: str):
+    """JSON: {"date": "YYYY-MM-DD" (default today), "done": true|false (default true)}."""
+    payload = request.get_json(silent=True) or {}
+    try:
+        day = date.fromisoformat(payload["date"]) if payload.get("date") else date.today()
+    except (TypeError, ValueError):
+        return jsonify({"error":"invalid date"}), 400
+    with HABITS:
+        habit = HABITS.get(name)
+        if habit is None:
+            return jsonify({"error":"not found"}), 404
+        idx = habit.day_index(day)
+        if day > date.today() or not habit.is_scheduled(idx):
+            return jsonify({"error":"not a scheduled day"}), 400
+        if habit.set_done(idx, bool(payload.get("done", True))):
+            HABITS.save()
+        return jsonify(habit.stats(date.today()))
+
+@APP.get("/api/habits/<string:name>/history")
+def api_habit_history(name: str):
+    """Completion dates, optionally limited with ?from=YYYY-MM-DD&to=YYYY-MM-DD."""
+    with HABITS:
+        habit = HABITS.get(name)
+        if habit is None:
+            return jsonify({"error":"not found"}), 404
+        try:
+            first = habit.day_index(date.fromisoformat(request.args["from"])) if request.args.get("from") else 0
+            last = habit.day_index(date.fromisoformat(request.args["to"])) if request.args.get("to") else habit.last_done
+        except ValueError:
+            return jsonify({"error":"invalid date"}), 400
+        return jsonify({"name": habit.name, "dates": habit.history(first, last)})
+
 # --- UI ---
 @APP.get("/")
 def index():
@@ -329,13 +3496,16 @@ body { background: linear-gradient(180deg,#eef6ff 0%,#f8fafc 40%); }
         <div class="flex flex-col sm:flex-row sm:items-center sm:justify-between gap-4 mb-4">
           <div>
             <label class="text-sm text-slate-600 mr-2" for="filter">Filter</label>
-            <select id="filter" class="px-3 py-2 rounded-lg border" onchange="render(tasks)" aria-label="Filter status">
+            <select id="filter" class="px-3 py-2 rounded-lg border" onchange="loadTasks()" aria-label="Filter status">
               <option value="all">All</option><option value="done">Completed</option><option value="todo">To Do</option>
             </select>
             <label class="ml-4 text-sm text-slate-600" for="filterCategory">Category</label>
-            <select id="filterCategory" class="px-3 py-2 rounded-lg border" onchange="render(tasks)" aria-label="Filter category">
+            <select id="filterCategory" class="px-3 py-2 rounded-lg border" onchange="loadTasks()" aria-label="Filter category">
               <option value="">All</option>
             </select>
+            <label class="sr-only" for="search">Search</label>
+            <input id="search" type="search" list="searchSuggestions" placeholder="Search…" class="ml-4 px-3 py-2 rounded-lg border w-40" aria-label="Search titles" />
+            <datalist id="searchSuggestions"></datalist>
           </div>
           <div class="flex gap-2">
             <button class="btn btn-ghost px-3 py-2 rounded-lg bg-slate-50 border" onclick="loadTasks()" aria-label="Refresh tasks">🔁 Refresh</button>
@@ -357,7 +3527,10 @@ body { background: linear-gradient(180deg,#eef6ff 0%,#f8fafc 40%); }
           </table>
         </div>
 
-        <div class="mt-4 text-sm text-slate-600" id="stats">Total visible: 0 — Completed (all): 0</div>
+        <div class="mt-4 flex items-center justify-between">
+          <div class="text-sm text-slate-600" id="stats">Total visible: 0 — Completed (all): 0</div>
+          <button id="loadMore" class="btn px-3 py-2 rounded-lg bg-white border hidden" onclick="loadMore()">Load more</button>
+        </div>
       </section>
 
       <!-- CONTROLS -->
@@ -370,6 +3543,20 @@ body { background: linear-gradient(180deg,#eef6ff 0%,#f8fafc 40%); }
           <label class="sr-only" for="category">Category</label>
           <input list="categories" id="category" placeholder="Category (e.g. study)" class="w-full px-3 py-2 rounded-lg border mb-2" />
           <datalist id="categories"></datalist>
+          <label class="sr-only" for="priority">Priority</label>
+          <select id="priority" class="w-full px-3 py-2 rounded-lg border mb-2">
+            <option value="1">Priority 1 (highest)</option>
+            <option value="2">Priority 2</option>
+            <option value="3" selected>Priority 3 (normal)</option>
+            <option value="4">Priority 4</option>
+            <option value="5">Priority 5 (lowest)</option>
+          </select>
+          <label class="sr-only" for="parent">Parent task</label>
+          <input id="parent" list="searchSuggestions" placeholder="Parent task (optional)" class="w-full px-3 py-2 rounded-lg border mb-2" />
+          <label class="sr-only" for="tags">Tags</label>
+          <input id="tags" placeholder="Tags, comma separated (optional)" class="w-full px-3 py-2 rounded-lg border mb-2" />
+          <label class="block text-sm text-slate-600 mb-1" for="due">Due (optional)</label>
+          <input id="due" type="datetime-local" class="w-full px-3 py-2 rounded-lg border mb-2" />
           <div class="flex gap-2">
             <button class="btn btn-primary px-4 py-2 rounded-lg bg-sky-600 text-white" onclick="addTask()" id="addBtn">➕ Add</button>
             <button class="btn px-4 py-2 rounded-lg bg-white border" onclick="clearInputs()">🧹 Clear</button>
@@ -377,19 +3564,50 @@ body { background: linear-gradient(180deg,#eef6ff 0%,#f8fafc 40%); }
           <div id="titleError" class="text-sm text-red-600 mt-2 hidden" role="alert"></div>
         </div>
 
+        <div class="bg-slate-50 p-4 rounded-lg">
+          <h3 class="font-semibold mb-2">Projects</h3>
+          <ul id="projects" class="space-y-2 text-sm"></ul>
+        </div>
+
+        <div class="bg-slate-50 p-4 rounded-lg">
+          <h3 class="font-semibold mb-2">Next Up</h3>
+          <ol id="nextUp" class="list-decimal list-inside space-y-1 text-sm"></ol>
+        </div>
+
         <div class="bg-slate-50 p-4 rounded-lg">
           <h3 class="font-semibold mb-2">Bulk Actions</h3>
           <div class="flex flex-col gap-2">
             <button class="btn px-4 py-2 rounded-lg bg-red-500 text-white" onclick="clearAll()">✖ Delete all</button>
+            <button class="btn px-4 py-2 rounded-lg bg-white border" onclick="archiveDone()" title="Move tasks completed longer ago than TODO_ARCHIVE_DAYS (all completed tasks when unset) to the archive">🗄 Archive old completed</button>
             <div class="flex gap-2">
               <button class="btn px-3 py-2 rounded-lg bg-white border" onclick="exportJson()">⬇ Export</button>
               <label class="btn px-3 py-2 rounded-lg bg-white border cursor-pointer" aria-label="Import JSON">
-                ⬆ Import <input id="importFile" type="file" accept="application/json" class="hidden" onchange="importFile(event)">
+                ⬆ Import <input id="importFile" type="file" accept="application/json,.json,.ndjson" class="hidden" onchange="importFile(event)">
+              </label>
+              <label class="flex items-center gap-1 text-sm text-slate-600" title="Keep existing tasks and update matching titles">
+                <input id="importMerge" type="checkbox"> Merge
               </label>
             </div>
           </div>
         </div>
 
+        <div class="bg-slate-50 p-4 rounded-lg">
+          <h3 class="font-semibold mb-2">Habits</h3>
+          <ul id="habitList" class="space-y-1 mb-3 text-sm"></ul>
+          <label class="sr-only" for="habitName">Habit</label>
+          <input id="habitName" maxlength="100" placeholder="Ex: Read 20 min" class="w-full px-3 py-2 rounded-lg border mb-2" />
+          <div class="flex gap-2">
+            <label class="sr-only" for="habitSchedule">Schedule</label>
+            <select id="habitSchedule" class="flex-1 px-2 py-2 rounded-lg border">
+              <option value="daily">Every day</option>
+              <option value="weekdays">Weekdays</option>
+              <option value="weekends">Weekends</option>
+              <option value="every2">Every 2 days</option>
+            </select>
+            <button class="btn px-3 py-2 rounded-lg bg-sky-600 text-white" onclick="addHabit()">➕</button>
+          </div>
+        </div>
+
       </aside>
     </div>
   </main>
@@ -417,6 +3635,10 @@ body { background: linear-gradient(180deg,#eef6ff 0%,#f8fafc 40%); }
 <script>
 let tasks = [];
 let editing = null;
+const PAGE_SIZE = 200; // tasks fetched per page (server-side filtering & paging)
+let nextCursor = null;
+let version = null; // store version of the loaded list, for /api/tasks/changes
+let totals = {total: 0, done_total: 0};
 let lastDeleted = null; // used for undo restore
 
 // theme toggle persisted (localStorage)
@@ -463,16 +3685,106 @@ function showToast(message, opts={type:'success', timeout:5000, undo:false, undo
 }
 
 // ---------- Data / UI ----------
+function tasksUrl(cursor){
+  const params = new URLSearchParams({limit: PAGE_SIZE});
+  const filter = document.getElementById('filter').value;
+  if(filter === 'done') params.set('done', '1');
+  if(filter === 'todo') params.set('done', '0');
+  const cat = document.getElementById('filterCategory').value;
+  if(cat) params.set('category', cat);
+  const q = document.getElementById('search').value.trim();
+  if(q) params.set('q', q);
+  if(cursor) params.set('cursor', cursor);
+  return '/api/tasks?' + params.toString();
+}
+async function fetchPage(cursor){
+  const res = await fetch(tasksUrl(cursor));
+  const page = await res.json();
+  if(!cursor) version = (res.headers.get('ETag') || '').replace(/"/g, '') || null;
+  nextCursor = page.next_cursor;
+  totals = {total: page.total, done_total: page.done_total};
+  document.getElementById('loadMore').classList.toggle('hidden', !nextCursor);
+  return page.items;
+}
 async function loadTasks(){
   try {
-    const res = await fetch('/api/tasks');
-    tasks = await res.json();
+    tasks = await fetchPage(null);
     updateCategoryDatalist();
-    populateFilterCategories();
+    render(tasks);
+    refreshPanels();
+  } catch(e){ showToast('Error: could not load tasks', {type:'error', timeout:3000}); }
+}
+function refreshPanels(){ loadNextUp(); loadProjects(); }
+async function loadProjects(){
+  const res = await fetch('/api/projects');
+  if(!res.ok) return;
+  const projects = await res.json();
+  document.getElementById('projects').innerHTML = projects.length
+    ? projects.map(p=>`<li><div class="flex justify-between"><span class="font-medium">${escapeHtml(p.title)}</span><span class="text-xs text-slate-500">${p.done}/${p.total}</span></div>`
+        + `<div class="h-2 bg-slate-200 rounded" role="progressbar" aria-valuenow="${p.percent}" aria-valuemin="0" aria-valuemax="100"><div class="h-2 bg-emerald-500 rounded" style="width:${p.percent}%"></div></div></li>`).join('')
+    : '<li class="text-slate-500">No subtasks yet</li>';
+}
+async function loadNextUp(){
+  const res = await fetch('/api/tasks/next?k=5');
+  if(!res.ok) return;
+  const {items} = await res.json();
+  document.getElementById('nextUp').innerHTML = items.length
+    ? items.map(t=>`<li><span class="font-medium">${escapeHtml(t.title)}</span> <span class="text-xs text-slate-500">P${t.priority||3}${t.due ? ' · 📅 '+escapeHtml(t.due.replace('T',' ').slice(0,16)) : ''}</span></li>`).join('')
+    : '<li class="list-none text-slate-500">Nothing open 🎉</li>';
+}
+async function loadMore(){
+  if(!nextCursor) return;
+  try {
+    tasks = tasks.concat(await fetchPage(nextCursor));
     render(tasks);
   } catch(e){ showToast('Error: could not load tasks', {type:'error', timeout:3000}); }
 }
 
+// ---------- Delta sync ----------
+function taskKey(title){ return (title||'').trim().toLowerCase(); }
+function matchesFilters(t){
+  const filter = document.getElementById('filter').value; const filterCat = document.getElementById('filterCategory').value;
+  const q = document.getElementById('search').value.trim().toLowerCase();
+  if(filterCat && (t.category||'general')!==filterCat) return false;
+  if(filter==='done' && !t.done) return false;
+  if(filter==='todo' && t.done) return false;
+  if(q && !(t.title||'').toLowerCase().includes(q)) return false;
+  return true;
+}
+// patch the loaded list with what changed on the server since `version`
+async function syncTasks(){
+  if(!version) return loadTasks();
+  try {
+    const res = await fetch('/api/tasks/changes?since='+encodeURIComponent(version));
+    const delta = await res.json();
+    if(!res.ok || delta.reset) return loadTasks();
+    applyChanges(delta);
+    version = delta.version;
+    totals.done_total = delta.done_total;
+    if(delta.changed.length) updateCategoryDatalist();
+    render(tasks);
+    if(delta.changed.length || delta.deleted.length) refreshPanels();
+  } catch(e){ return loadTasks(); }
+}
+function applyChanges(delta){
+  const pos = new Map(tasks.map((t,i)=>[taskKey(t.title), i]));
+  const removed = new Set();
+  delta.deleted.forEach(title=>{
+    const i = pos.get(taskKey(title));
+    if(i === undefined) return;
+    removed.add(i); totals.total--;
+  });
+  delta.changed.forEach(t=>{
+    const i = pos.get(taskKey(t.title));
+    if(i !== undefined){
+      if(matchesFilters(t)) tasks[i] = t; else { removed.add(i); totals.total--; }
+    } else {
+      if(matchesFilters(t)){ tasks.push(t); totals.total++; }
+    }
+  });
+  if(removed.size) tasks = tasks.filter((_, i)=>!removed.has(i));
+}
+
 function updateCategoryDatalist(){
   // fetch categories from server (or derive locally)
   fetch('/api/categories').then(r=>r.json()).then(cats=>{
@@ -490,6 +3802,7 @@ function updateCategoryDatalist(){
 
 function populateFilterCategories(){
   const sel = document.getElementById('filterCategory');
+  const current = sel.value; // keep the active filter across refreshes
   sel.innerHTML = '<option value="">All</option>';
   // pull from datalist options
   const dl = document.getElementById('categories');
@@ -497,9 +3810,10 @@ function populateFilterCategories(){
   opts.forEach(v=>{
     const o = document.createElement('option'); o.value = v; o.textContent = v; sel.appendChild(o);
   });
+  sel.value = opts.includes(current) ? current : '';
 }
 
-function clearInputs(){ document.getElementById('title').value=''; document.getElementById('category').value='study'; document.getElementById('titleError').classList.add('hidden'); }
+function clearInputs(){ document.getElementById('title').value=''; document.getElementById('category').value='study'; document.getElementById('due').value=''; document.getElementById('priority').value='3'; document.getElementById('tags').value=''; document.getElementById('parent').value=''; document.getElementById('titleError').classList.add('hidden'); }
 async function addTask(){
   const titleEl = document.getElementById('title');
   const title = titleEl.value.trim();
@@ -520,14 +3834,27 @@ async function addTask(){
     return;
   }
   document.getElementById('titleError').classList.add('hidden');
-  const res = await fetch('/api/tasks',{method:'POST',headers:{'Content-Type':'application/json'}, body: JSON.stringify({title,category})});
-  if(res.ok){ await loadTasks(); clearInputs(); showToast('Task added'); } else { const j=await res.json(); showToast(j.error||'Error adding task', {type:'error'}); }
+  const due = document.getElementById('due').value || null;
+  const priority = parseInt(document.getElementById('priority').value, 10);
+  const tags = document.getElementById('tags').value;
+  const parent = document.getElementById('parent').value.trim() || null;
+  const res = await fetch('/api/tasks',{method:'POST',headers:{'Content-Type':'application/json'}, body: JSON.stringify({title,category,due,priority,tags,parent})});
+  if(res.ok){ await syncTasks(); clearInputs(); showToast('Task added'); } else { const j=await res.json(); showToast(j.error||'Error adding task', {type:'error'}); }
 }
 
 // toggle done
+// writes carry the version the row was rendered from; 409 means someone else changed it first
+function versionOf(title){ const t = tasks.find(x=>x.title===title); return t ? t.version : undefined; }
+async function handleConflict(res){
+  if(res.status !== 409) return false;
+  showToast('This task was changed elsewhere; the list has been refreshed', {type:'error'});
+  await syncTasks();
+  return true;
+}
 async function toggleDone(title, done){
-  await fetch('/api/tasks/mark',{method:'POST',headers:{'Content-Type':'application/json'},body: JSON.stringify({title, done})});
-  loadTasks();
+  const res = await fetch('/api/tasks/mark',{method:'POST',headers:{'Content-Type':'application/json'},body: JSON.stringify({title, done, version: versionOf(title)})});
+  if(await handleConflict(res)) return;
+  syncTasks();
 }
 async function markDone(title){ return toggleDone(title, true); }
 async function unmarkDone(title){ return toggleDone(title, false); }
@@ -538,18 +3865,17 @@ async function deleteTask(title){
   // capture current task object to allow undo
   const tObj = tasks.find(t=>t.title === title);
   lastDeleted = tObj ? JSON.parse(JSON.stringify(tObj)) : null;
-  const res = await fetch('/api/tasks/'+encodeURIComponent(title), {method:'DELETE'});
+  const v = versionOf(title);
+  const res = await fetch('/api/tasks/'+encodeURIComponent(title), {method:'DELETE', headers: v ? {'If-Match': `"${v}"`} : {}});
+  if(await handleConflict(res)) return;
   if(res.ok){
-    loadTasks();
+    syncTasks();
     showToast('Task deleted', {undo:true, undoCallback: async ()=>{
       if(lastDeleted){
-        // re-add the deleted task (restore original done state)
-        await fetch('/api/tasks', {method:'POST', headers:{'Content-Type':'application/json'}, body: JSON.stringify({title: lastDeleted.title, category: lastDeleted.category})});
-        // if it was completed before delete, mark it
-        if(lastDeleted.done){
-          await fetch('/api/tasks/mark', {method:'POST', headers:{'Content-Type':'application/json'}, body: JSON.stringify({title:lastDeleted.title, done:true})});
-        }
-        await loadTasks();
+        // re-add the deleted task with its original done state, in one request
+        const op = {op:'add', title: lastDeleted.title, category: lastDeleted.category, done: !!lastDeleted.done, created: lastDeleted.created, due: lastDeleted.due, priority: lastDeleted.priority, tags: lastDeleted.tags, parent: lastDeleted.parent};
+        await fetch('/api/tasks/batch', {method:'POST', headers:{'Content-Type':'application/json'}, body: JSON.stringify({ops: [op]})});
+        await syncTasks();
         showToast('Undo: task restored');
         lastDeleted = null;
       }
@@ -579,6 +3905,19 @@ function render(list){
     tr.className = 'border-b';
     const titleTd = document.createElement('td'); titleTd.className='px-6 py-4';
     titleTd.innerHTML = t.done ? `<span class="line-through text-slate-400">${escapeHtml(t.title)}</span>` : `<span class="font-medium">${escapeHtml(t.title)}</span>`;
+    if(t.priority && t.priority !== 3){
+      titleTd.innerHTML += ` <span class="text-xs font-semibold ${t.priority < 3 ? 'text-red-600' : 'text-slate-400'}">P${t.priority}</span>`;
+    }
+    if(t.parent){
+      titleTd.innerHTML += `<div class="text-xs text-slate-500">↳ ${escapeHtml(t.parent)}</div>`;
+    }
+    if(t.tags && t.tags.length){
+      titleTd.innerHTML += `<div class="flex flex-wrap gap-1 mt-1">${t.tags.map(g=>`<span class="px-2 rounded-full text-xs bg-indigo-50 text-indigo-700">#${escapeHtml(g)}</span>`).join('')}</div>`;
+    }
+    if(t.due){
+      const overdue = !t.done && new Date(t.due) < new Date();
+      titleTd.innerHTML += `<div class="text-xs ${overdue ? 'text-red-600' : 'text-slate-500'}">📅 ${escapeHtml(t.due.replace('T',' ').slice(0,16))}</div>`;
+    }
     tr.appendChild(titleTd);
 
     const catTd = document.createElement('td'); catTd.className='px-6 py-4'; catTd.innerHTML = badgeHTML(t.category || 'general'); tr.appendChild(catTd);
@@ -604,8 +3943,8 @@ function render(list){
 
     tr.appendChild(actionsTd); tbody.appendChild(tr);
   });
-  const completedAll = (tasks||[]).filter(x=>x.done).length;
-  document.getElementById('stats').textContent = `Total visible: ${visible} — Completed (all): ${completedAll}`;
+  // counts come from the server: the page only holds part of the matching tasks
+  document.getElementById('stats').textContent = `Total visible: ${Math.max(totals.total, visible)} — Completed (all): ${totals.done_total}`;
 }
 
 // safe escape
@@ -631,8 +3970,9 @@ async function saveEdit(){
   const newTitle = document.getElementById('editTitle').value.trim();
   const newCat = (document.getElementById('editCategory').value || 'general').trim();
   if(!newTitle) { showToast('Title required', {type:'error'}); return; }
-  const res = await fetch('/api/tasks/'+encodeURIComponent(editing), {method:'PUT', headers:{'Content-Type':'application/json'}, body: JSON.stringify({title:newTitle, category:newCat})});
-  if(res.ok){ closeModal(); loadTasks(); showToast('Task updated'); } else { const j=await res.json(); showToast(j.error||'Error', {type:'error'}); }
+  const res = await fetch('/api/tasks/'+encodeURIComponent(editing), {method:'PUT', headers:{'Content-Type':'application/json'}, body: JSON.stringify({title:newTitle, category:newCat, version: versionOf(editing)})});
+  if(await handleConflict(res)){ closeModal(); return; }
+  if(res.ok){ closeModal(); syncTasks(); showToast('Task updated'); } else { const j=await res.json(); showToast(j.error||'Error', {type:'error'}); }
 }
 
 // bulk actions
@@ -646,7 +3986,7 @@ async function markVisibleDone(){
   }).map(t=>t.title);
   if(visible.length===0) return showToast('No visible tasks to mark', {type:'error'});
   await fetch('/api/tasks/mark-bulk', {method:'POST', headers:{'Content-Type':'application/json'}, body: JSON.stringify({titles: visible, done: true})});
-  loadTasks(); showToast('Marked visible tasks as completed');
+  syncTasks(); showToast('Marked visible tasks as completed');
 }
 async function unmarkVisible(){
   const filter = document.getElementById('filter').value; const filterCat = document.getElementById('filterCategory').value;
@@ -658,22 +3998,45 @@ async function unmarkVisible(){
   }).map(t=>t.title);
   if(visible.length===0) return showToast('No visible tasks to unmark', {type:'error'});
   await fetch('/api/tasks/mark-bulk', {method:'POST', headers:{'Content-Type':'application/json'}, body: JSON.stringify({titles: visible, done: false})});
-  loadTasks(); showToast('Unmarked visible tasks');
+  syncTasks(); showToast('Unmarked visible tasks');
 }
 
 async function clearAll(){ if(!confirm('Delete all tasks? This is irreversible.')) return; await fetch('/api/clear', {method:'POST'}); loadTasks(); showToast('All tasks deleted'); }
+async function archiveDone(){
+  const res = await fetch('/api/archive', {method:'POST', headers:{'Content-Type':'application/json'}, body: '{}'});
+  const j = await res.json();
+  if(res.ok){ await syncTasks(); showToast(`${j.archived} task(s) archived`); } else { showToast(j.error||'Archive error', {type:'error'}); }
+}
 function exportJson(){ window.location = '/api/export'; }
-function importFile(ev){
+async function importFile(ev){
   const file = ev.target.files[0]; if(!file) return;
-  const reader = new FileReader();
-  reader.onload = async function(e){
-    try{
-      const tasksList = JSON.parse(e.target.result);
-      const res = await fetch('/api/import', {method:'POST', headers:{'Content-Type':'application/json'}, body: JSON.stringify(tasksList)});
-      if(res.ok){ loadTasks(); showToast('Import OK'); } else { const j=await res.json(); showToast(j.error||'Import error', {type:'error'}); }
-    } catch(err){ showToast('Invalid JSON file', {type:'error'}); }
-  };
-  reader.readAsText(file, 'utf-8');
+  ev.target.value = '';
+  // the file is streamed as-is; the server parses JSON arrays and NDJSON incrementally
+  const ndjson = /\.ndjson$/i.test(file.name);
+  const mode = document.getElementById('importMerge').checked ? 'merge' : 'replace';
+  try{
+    const res = await fetch('/api/import?mode='+mode, {method:'POST', headers:{'Content-Type': ndjson ? 'application/x-ndjson' : 'application/json'}, body: file});
+    const j = await res.json();
+    if(res.ok){ loadTasks(); showToast(`Import OK (${j.imported} tasks)`); } else { showToast(j.error||'Import error', {type:'error'}); }
+  } catch(err){ showToast('Import error', {type:'error'}); }
+}
+
+// search (debounced, filtered server-side)
+let searchTimer = null;
+document.getElementById('search').addEventListener('input', function(){
+  clearTimeout(searchTimer);
+  searchTimer = setTimeout(()=>{ loadTasks(); suggestTitles(); }, 250);
+});
+// typo-tolerant suggestions from the server-side title index
+async function suggestTitles(){
+  const q = document.getElementById('search').value.trim();
+  const dl = document.getElementById('searchSuggestions'); dl.innerHTML = '';
+  if(q.length < 2) return;
+  try {
+    const res = await fetch('/api/tasks/search?limit=8&q='+encodeURIComponent(q));
+    const data = await res.json();
+    data.items.forEach(it=>{ const o = document.createElement('option'); o.value = it.task.title; dl.appendChild(o); });
+  } catch(e){}
 }
 
 // keyboard support
@@ -691,12 +4054,134 @@ document.addEventListener('keydown', function(e){
   }
 });
 
+// live updates from other tabs / clients
+function connectEvents(){
+  if(!window.EventSource) return;
+  const es = new EventSource('/api/events');
+  es.addEventListener('change', e=>{
+    const d = JSON.parse(e.data);
+    if(d.version === version) return; // already applied (our own action)
+    if(d.since !== version) return syncTasks();
+    applyChanges(d);
+    version = d.version;
+    totals.done_total = d.done_total;
+    render(tasks);
+    refreshPanels();
+  });
+  es.addEventListener('categories', ()=>updateCategoryDatalist());
+  es.addEventListener('reset', ()=>loadTasks());
+  es.addEventListener('reminder', e=>{ const t = JSON.parse(e.data); showToast(`⏰ Due now: ${t.title}`); });
+}
+
+// --- habits ---
+const HABIT_SCHEDULES = {
+  daily: {type:'daily'},
+  weekdays: {type:'weekly', days:[0,1,2,3,4]},
+  weekends: {type:'weekly', days:[5,6]},
+  every2: {type:'interval', every:2},
+};
+async function loadHabits(){
+  const res = await fetch('/api/habits');
+  if(!res.ok) return;
+  const habits = await res.json();
+  const ul = document.getElementById('habitList');
+  ul.innerHTML = habits.length ? '' : '<li class="text-slate-500">No habits yet</li>';
+  for(const h of habits){
+    const li = document.createElement('li');
+    li.className = 'flex items-center justify-between gap-2';
+    const toggle = h.due_today
+      ? `<button class="btn px-2 py-1 rounded border ${h.done_today ? 'bg-emerald-100' : 'bg-white'}" data-habit="${escapeHtml(h.name)}" data-done="${h.done_today}">${h.done_today ? '✓ Done' : '✓ Today'}</button>`
+      : '<span class="text-xs text-slate-400">rest day</span>';
+    li.innerHTML = `<span><strong>${escapeHtml(h.name)}</strong> <span class="text-xs text-slate-500" title="longest ${h.longest_streak}, ${Math.round(h.rate*100)}% kept">🔥 ${h.current_streak}</span></span><span class="flex gap-1">${toggle}<button class="btn px-2 py-1 rounded border bg-white" data-del="${escapeHtml(h.name)}" aria-label="Delete habit">✖</button></span>`;
+    ul.appendChild(li);
+  }
+  ul.querySelectorAll('[data-habit]').forEach(b => b.onclick = () => checkHabit(b.dataset.habit, b.dataset.done !== 'true'));
+  ul.querySelectorAll('[data-del]').forEach(b => b.onclick = () => deleteHabit(b.dataset.del));
+}
+async function addHabit(){
+  const input = document.getElementById('habitName');
+  const name = input.value.trim();
+  if(!name) return;
+  const schedule = HABIT_SCHEDULES[document.getElementById('habitSchedule').value];
+  const res = await fetch('/api/habits', {method:'POST', headers:{'Content-Type':'application/json'}, body: JSON.stringify({name, schedule})});
+  const j = await res.json();
+  if(!res.ok){ showToast(j.error||'Error', {type:'error'}); return; }
+  input.value = '';
+  loadHabits();
+}
+async function checkHabit(name, done){
+  const res = await fetch(`/api/habits/${encodeURIComponent(name)}/check`, {method:'POST', headers:{'Content-Type':'application/json'}, body: JSON.stringify({done})});
+  if(!res.ok){ const j = await res.json(); showToast(j.error||'Error', {type:'error'}); }
+  loadHabits();
+}
+async function deleteHabit(name){
+  if(!confirm(`Delete habit "${name}"?`)) return;
+  await fetch(`/api/habits/${encodeURIComponent(name)}`, {method:'DELETE'});
+  loadHabits();
+}
+
 // initial load
 loadTasks();
+loadHabits();
+connectEvents();
 </script>
 </body></html>
 """
     return render_template_string(html)
 
+def memory_benchmark(n: int) -> None:
+    """
+    Memory held by n tasks: parsed as plain dicts, as Task records, and loaded
+    into a private TaskStore with every index (the cost per task of a running
+    worker), with the share of each index. The data files are not touched.
+    """
+    import tracemalloc, gc
+    cats = DEFAULT_CATEGORIES
+    raw = json.dumps([{"title": f"Task {i}", "category": cats[i % len(cats)], "done": i % 3 == 0,
+                       "created": f"2024-01-01T00:{i // 60 % 60:02d}:{i % 60:02d}", "version": 1, "priority": 3,
+                       **({"due": f"2024-02-{1 + i % 28:02d}T09:00:00"} if i % 4 == 0 else {}),
+                       **({"tags": ["home", "urgent"][:1 + i % 2]} if i % 5 == 0 else {}),
+                       **({"parent": f"Task {i - 1}"} if i % 10 == 1 else {})}
+                      for i in range(n)])
+
+    def traced(build):
+        gc.collect()
+        tracemalloc.start()
+        result = build()
+        size = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        return size, result
+
+    def report(label: str, size: int) -> None:
+        print(f"{label:>18}: {size / 2**20:8.1f} MiB  {size / n:6.0f} bytes/task")
+
+    for label, hook in (("dict", None), ("Task", Task)):
+        size, tasks = traced(lambda: json.loads(raw, object_hook=hook))
+        report(label, size)
+        del tasks
+    store = TaskStore(JsonBackend())
+    store.categories.names = list(cats)   # known already: nothing to persist
+    store.categories.clear()
+    size, _ = traced(lambda: store._reset(json.loads(raw, object_hook=Task)))
+    report("loaded store", size)
+    # each index is rebuilt on its own over the loaded records (keys are already interned)
+    items = list(store._tasks.items())
+    def rebuild(idx):
+        idx.clear()
+        if hasattr(idx, "rebuild"):
+            idx.rebuild(items)
+        else:
+            for tid, task in items:
+                idx.add(tid, task)
+    for idx in store.indexes:
+        size, _ = traced(lambda: rebuild(idx))
+        report(type(idx).__name__, size)
+
 if __name__ == "__main__":
-    APP.run(debug=True, port=8000)
+    if "--bench-memory" in sys.argv:
+        i = sys.argv.index("--bench-memory")
+        memory_benchmark(int(sys.argv[i + 1]) if len(sys.argv) > i + 1 else 1_000_000)
+        sys.exit()
+    # no reloader: its watcher process would import the module too and run a second
+    # copy of the backup/archive scheduler and reminder thread over stale data
+    APP.run(debug=True, port=8000, use_reloader=False)
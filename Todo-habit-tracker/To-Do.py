@@ -1,9 +1,28 @@
 # ------------------------------
 # To-Do & Habit Tracker - Starter
 # ------------------------------
+import sys
+
+
+class Task:
+    # Compact task: fixed slots instead of a dict per task, and category
+    # strings shared between tasks (sys.intern). task["title"] still works.
+    __slots__ = ("title", "category", "done")
+
+    def __init__(self, title, category, done=False):
+        self.title = title
+        self.category = sys.intern(category)
+        self.done = done
+
+    def __getitem__(self, key):
+        return getattr(self, key)
+
+    def __setitem__(self, key, value):
+        setattr(self, key, value)
+
 
 def add_task(tasks, title, category):
-    tasks.append({"title": title, "done": False, "category": category})
+    tasks.append(Task(title, category))
 
 
 def mark_done(tasks, title):
@@ -53,11 +72,7 @@ def load_tasks(filename="tasks.txt"):
         with open(filename, "r") as f:
             for line in f:
                 title, category, done = line.strip().split(",")
-                tasks.append({
-                    "title": title,
-                    "category": category,
-                    "done": done == "True"
-                })
+                tasks.append(Task(title, category, done == "True"))
     except FileNotFoundError:
         print("⚠️ Fichier introuvable.")
     return tasks
@@ -125,5 +140,30 @@ def main():
             print("❌ Invalid choice.")
 
 
+def memory_benchmark(n=1_000_000):
+    # python To-Do.py --bench-memory [N]: memory of N tasks as dicts vs Task objects
+    import tracemalloc
+    categories = ["study", "work", "personal", "general"]
+    lines = [f"Task {i},{categories[i % 4]},{i % 3 == 0}" for i in range(n)]
+
+    for label in ("dict", "Task"):
+        tracemalloc.start()
+        tasks = []
+        for line in lines:
+            title, category, done = line.split(",")
+            if label == "dict":
+                tasks.append({"title": title, "category": category, "done": done == "True"})
+            else:
+                tasks.append(Task(title, category, done == "True"))
+        size = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        print(f"{label:>5}: {size / 2**20:7.1f} MiB  {size / n:5.0f} bytes/task")
+        del tasks
+
+
 # Run
-main()
+if "--bench-memory" in sys.argv:
+    i = sys.argv.index("--bench-memory")
+    memory_benchmark(int(sys.argv[i + 1]) if len(sys.argv) > i + 1 else 1_000_000)
+else:
+    main()